@@ -0,0 +1,178 @@
+"""
+Audio control for TimeGuard
+Saves, mutes and restores the master volume around the block screen
+
+PycawAudioController keeps one activated endpoint on a dedicated COM thread,
+so CoInitialize, GetSpeakers and Activate run once instead of on every call.
+The endpoint is dropped when Windows reports a new default output device.
+Without comtypes/pycaw the NullAudioController is used and does nothing.
+"""
+
+import ctypes
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from logger import log_debug, log_info, log_warning
+
+# Upper bound for one volume call, so a hung audio service cannot freeze the caller
+CALL_TIMEOUT = 3.0
+
+
+class NullAudioController:
+    """Audio controller interface; this implementation has no audio device."""
+
+    available = False
+
+    def prewarm(self):
+        """Prepare the device in the background so the first real call is fast."""
+
+    def get_volume(self):
+        """Return the master volume (0.0 to 1.0), or None if it cannot be read."""
+        return None
+
+    def set_volume(self, level):
+        """Set the master volume (0.0 to 1.0). Returns True on success."""
+        return False
+
+    def invalidate(self):
+        """Forget the cached device; the next call activates the current default."""
+
+    def close(self):
+        pass
+
+
+class PycawAudioController(NullAudioController):
+    """Master volume of the default output device through pycaw."""
+
+    available = True
+
+    def __init__(self):
+        from comtypes import CLSCTX_ALL, CoInitialize, CoUninitialize
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+        self.CLSCTX_ALL = CLSCTX_ALL
+        self.CoUninitialize = CoUninitialize
+        self.AudioUtilities = AudioUtilities
+        self.IAudioEndpointVolume = IAudioEndpointVolume
+        # COM objects belong to the thread that created them, so every call
+        # goes through this one worker, which initializes COM once
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='Audio',
+                                           initializer=CoInitialize)
+        self.endpoint = None  # Only touched on the worker thread
+        self.stale = False  # Set from any thread when the default device changes
+        self.notification_client = None
+        self.executor.submit(self._register_device_notifications)
+
+    def _call(self, function, *args):
+        try:
+            return self.executor.submit(function, *args).result(CALL_TIMEOUT)
+        except FutureTimeout:
+            log_warning("Volume] Audio call timed out")
+        except RuntimeError:
+            pass  # Closed
+        return None
+
+    def _register_device_notifications(self):
+        try:
+            from pycaw.callbacks import MMNotificationClient
+        except ImportError:
+            log_debug("Volume] pycaw has no device notifications, endpoint is refreshed on errors only")
+            return
+
+        controller = self
+
+        class DefaultDeviceWatcher(MMNotificationClient):
+            def on_default_device_changed(self, flow, flow_id, role, role_id, default_device_id):
+                controller.invalidate()
+
+        try:
+            client = DefaultDeviceWatcher()
+            self.AudioUtilities.GetDeviceEnumerator().RegisterEndpointNotificationCallback(client)
+            self.notification_client = client  # Keep the COM object alive
+        except Exception as e:
+            log_debug(f"Volume] Could not watch default device changes: {e}")
+
+    def _endpoint(self):
+        if self.stale:
+            self.stale = False
+            self.endpoint = None
+            log_debug("Volume] Default audio device changed")
+        if self.endpoint is None:
+            devices = self.AudioUtilities.GetSpeakers()
+            # Newer pycaw wraps the IMMDevice in an AudioDevice with _dev
+            device = devices._dev if hasattr(devices, '_dev') else devices
+            interface = device.Activate(self.IAudioEndpointVolume._iid_, self.CLSCTX_ALL, None)
+            self.endpoint = ctypes.cast(interface, ctypes.POINTER(self.IAudioEndpointVolume))
+            log_debug("Volume] Audio endpoint activated")
+        return self.endpoint
+
+    def _with_endpoint(self, action):
+        # A device that went away fails the call; activate the new default and retry once
+        try:
+            return action(self._endpoint())
+        except Exception as e:
+            log_debug(f"Volume] Audio call failed, reactivating endpoint: {e}")
+            self.endpoint = None
+            try:
+                return action(self._endpoint())
+            except Exception as e:
+                log_debug(f"Volume] Audio call failed: {e}")
+                return None
+
+    def prewarm(self):
+        self.executor.submit(self._with_endpoint, lambda endpoint: True)
+
+    def get_volume(self):
+        level = self._call(self._with_endpoint, lambda endpoint: endpoint.GetMasterVolumeLevelScalar())
+        if level is not None:
+            log_debug(f"Volume] Current volume level: {level * 100:.0f}%")
+        return level
+
+    def set_volume(self, level):
+        # Clamp value between 0.0 and 1.0
+        level = max(0.0, min(1.0, level))
+
+        def apply(endpoint):
+            endpoint.SetMasterVolumeLevelScalar(level, None)
+            return True
+
+        if self._call(self._with_endpoint, apply):
+            log_debug(f"Volume] Volume set to: {level * 100:.0f}%")
+            return True
+        return False
+
+    def invalidate(self):
+        self.stale = True
+
+    def close(self):
+        def release():
+            self.endpoint = None
+            if self.notification_client is not None:
+                try:
+                    self.AudioUtilities.GetDeviceEnumerator().UnregisterEndpointNotificationCallback(
+                        self.notification_client)
+                except Exception:
+                    pass
+                self.notification_client = None
+            self.CoUninitialize()
+        try:
+            self.executor.submit(release)
+        except RuntimeError:
+            return  # Already closed
+        self.executor.shutdown(wait=False)
+
+
+_audio_instance = None
+_audio_lock = threading.Lock()
+
+def get_audio_controller():
+    """Shared controller; imports comtypes/pycaw on first use."""
+    global _audio_instance
+    with _audio_lock:
+        if _audio_instance is None:
+            try:
+                _audio_instance = PycawAudioController()
+                log_info("Audio control libraries loaded successfully")
+            except Exception as e:
+                # ImportError off Windows or without pycaw, OSError without an audio service
+                log_warning(f"Audio control not available: {e}")
+                _audio_instance = NullAudioController()
+        return _audio_instance
@@ -0,0 +1,371 @@
+"""
+Fake Windows and GUI backends for running TimeGuard headless
+Installed into sys.modules / ctypes before the application modules are imported
+"""
+
+import collections
+import ctypes
+import sys
+import threading
+import types
+
+WM_QUIT = 0x0012
+
+
+class FakeFunction:
+    """Stand-in for a ctypes foreign function: accepts argtypes/restype and counts calls."""
+
+    def __init__(self, name, result=0, implementation=None):
+        self.__name__ = name
+        self.result = result
+        self.implementation = implementation  # Called instead of returning `result`
+        self.calls = 0
+        self.argtypes = None
+        self.restype = None
+
+    def __call__(self, *args):
+        self.calls += 1
+        if self.implementation is not None:
+            return self.implementation(*args)
+        return self.result
+
+
+class FakeDLL:
+    """Stand-in for ctypes.windll.<library>: every attribute is a FakeFunction."""
+
+    def __init__(self, name, results=None):
+        self._name = name
+        self._results = results or {}
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        function = FakeFunction(name, self._results.get(name, 0))
+        setattr(self, name, function)
+        return function
+
+
+class FakeMessageQueues:
+    """Per-thread message queues: GetMessageW blocks until PostThreadMessageW posts to it."""
+
+    def __init__(self):
+        self.queues = collections.defaultdict(collections.deque)
+        self.condition = threading.Condition()
+
+    def GetCurrentThreadId(self):
+        return threading.get_ident() & 0xFFFFFFFF
+
+    def PeekMessageW(self, msg, hwnd, first, last, remove):
+        with self.condition:
+            self.queues[self.GetCurrentThreadId()]
+        return 0
+
+    def GetMessageW(self, msg, hwnd, first, last):
+        with self.condition:
+            queue = self.queues[self.GetCurrentThreadId()]
+            while not queue:
+                self.condition.wait()
+            message = queue.popleft()
+        return 0 if message == WM_QUIT else 1
+
+    def PostThreadMessageW(self, thread_id, message, w_param, l_param):
+        with self.condition:
+            if thread_id not in self.queues:
+                return 0
+            self.queues[thread_id].append(message)
+            self.condition.notify_all()
+        return 1
+
+
+class FakeWinDLL:
+    def __init__(self):
+        self.user32 = FakeDLL('user32', {
+            'SetWindowsHookExW': 1,
+            'GetSystemMetrics': 1920,
+            'GetDesktopWindow': 1,
+        })
+        self.kernel32 = FakeDLL('kernel32')
+        self.shell32 = FakeDLL('shell32')
+        messages = FakeMessageQueues()
+        for name in ('PeekMessageW', 'GetMessageW', 'PostThreadMessageW'):
+            setattr(self.user32, name, FakeFunction(name, implementation=getattr(messages, name)))
+        self.kernel32.GetCurrentThreadId = FakeFunction(
+            'GetCurrentThreadId', implementation=messages.GetCurrentThreadId)
+
+
+class FakeWin32Gui(types.ModuleType):
+    """A desktop with a fixed number of ordinary top-level windows."""
+
+    def __init__(self, window_count=40):
+        super().__init__('win32gui')
+        self.windows = {hwnd: {'class': 'AppWindow', 'rect': (0, 0, 800, 600)}
+                        for hwnd in range(1000, 1000 + window_count)}
+        self.overlay_hwnd = 1
+
+    def EnumWindows(self, callback, extra):
+        for hwnd in list(self.windows):
+            if not callback(hwnd, extra):
+                break
+
+    def IsWindowVisible(self, hwnd):
+        return hwnd in self.windows
+
+    def GetWindowLong(self, hwnd, index):
+        return 0x10000000  # WS_VISIBLE
+
+    def GetClassName(self, hwnd):
+        return self.windows[hwnd]['class']
+
+    def GetWindowRect(self, hwnd):
+        return self.windows[hwnd]['rect']
+
+    def ShowWindow(self, hwnd, command):
+        return True
+
+    def FindWindow(self, class_name, title):
+        return self.overlay_hwnd
+
+    def GetDesktopWindow(self):
+        return 0
+
+
+def _make_win32con():
+    module = types.ModuleType('win32con')
+    module.GWL_STYLE = -16
+    module.WS_VISIBLE = 0x10000000
+    module.WS_DISABLED = 0x08000000
+    module.SW_MINIMIZE = 6
+    return module
+
+
+class FakeWidget:
+    """Minimal tkinter widget: accepts any options and remembers configured text."""
+
+    _next_id = 100
+
+    def __init__(self, master=None, **options):
+        self.master = master
+        self.options = dict(options)
+        self.destroyed = False
+        self._text = ""
+        FakeWidget._next_id += 1
+        self._id = FakeWidget._next_id
+
+    def pack(self, **options):
+        pass
+
+    def bind(self, sequence, callback, add=None):
+        pass
+
+    def config(self, **options):
+        self.options.update(options)
+
+    configure = config
+
+    def focus_set(self):
+        pass
+
+    def focus_force(self):
+        pass
+
+    def get(self):
+        return self._text
+
+    def insert(self, index, text):
+        self._text += text
+
+    def delete(self, first, last=None):
+        self._text = ""
+
+    def winfo_exists(self):
+        return not self.destroyed
+
+    def winfo_id(self):
+        return self._id
+
+    def destroy(self):
+        self.destroyed = True
+
+
+class FakeToplevel(FakeWidget):
+    def __init__(self, master=None, **options):
+        super().__init__(master, **options)
+        self.pending = {}
+        self._after_id = 0
+
+    def title(self, text):
+        self._title = text
+
+    def attributes(self, *args):
+        pass
+
+    def protocol(self, name, callback):
+        pass
+
+    def geometry(self, spec):
+        pass
+
+    def resizable(self, width, height):
+        pass
+
+    def withdraw(self):
+        pass
+
+    def deiconify(self):
+        pass
+
+    def lift(self):
+        pass
+
+    def update_idletasks(self):
+        pass
+
+    def after(self, delay, callback, *args):
+        # Timers never fire by themselves; benchmarks run callbacks explicitly
+        self._after_id += 1
+        after_id = f"after#{self._after_id}"
+        self.pending[after_id] = (callback, args)
+        return after_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_pending(self):
+        """Run the callbacks queued with after() so far, as the Tk loop would."""
+        pending, self.pending = self.pending, {}
+        for callback, args in pending.values():
+            callback(*args)
+
+    def wait_window(self, window):
+        pass
+
+    def mainloop(self):
+        pass
+
+    def quit(self):
+        pass
+
+
+def _make_tkinter():
+    tkinter = types.ModuleType('tkinter')
+    tkinter.Tk = FakeToplevel
+    tkinter.Toplevel = FakeToplevel
+    for name in ('Frame', 'Label', 'Entry', 'Button', 'LabelFrame', 'Checkbutton'):
+        setattr(tkinter, name, type(name, (FakeWidget,), {}))
+
+    class Variable:
+        def __init__(self, value=None):
+            self.value = value
+
+        def get(self):
+            return self.value
+
+        def set(self, value):
+            self.value = value
+
+    tkinter.StringVar = tkinter.BooleanVar = Variable
+    tkinter.TclError = RuntimeError
+    tkinter.END = 'end'
+    tkinter.BOTH = 'both'
+    tkinter.X = 'x'
+    tkinter.LEFT = 'left'
+
+    messagebox = types.ModuleType('tkinter.messagebox')
+    for name in ('showinfo', 'showwarning', 'showerror'):
+        setattr(messagebox, name, lambda *args, **kwargs: 'ok')
+    simpledialog = types.ModuleType('tkinter.simpledialog')
+    simpledialog.askstring = lambda *args, **kwargs: None
+    ttk = types.ModuleType('tkinter.ttk')
+    ttk.Combobox = type('Combobox', (FakeWidget,), {})
+
+    tkinter.messagebox = messagebox
+    tkinter.simpledialog = simpledialog
+    tkinter.ttk = ttk
+    return {'tkinter': tkinter, 'tkinter.messagebox': messagebox,
+            'tkinter.simpledialog': simpledialog, 'tkinter.ttk': ttk}
+
+
+class FakeWindowManager:
+    """window_manager.WindowManager stand-in that records calls and can fire window events."""
+
+    def __init__(self):
+        self.calls = collections.Counter()
+        self.callback = None
+
+    def _record(name, result=None):
+        def method(self, *args):
+            self.calls[name] += 1
+            return result
+        method.__name__ = name
+        return method
+
+    find_window = _record('find_window', 1)
+    force_window_to_top = _record('force_window_to_top', True)
+    minimize_window = _record('minimize_window')
+    minimize_all_other_windows = _record('minimize_all_other_windows')
+    minimize_fullscreen_windows = _record('minimize_fullscreen_windows')
+    stop_all_media = _record('stop_all_media')
+    invalidate_screen_metrics = _record('invalidate_screen_metrics')
+    reset_tracking = _record('reset_tracking')
+    del _record
+
+    def top_level_handle(self, hwnd):
+        return hwnd
+
+    def start_watching(self, callback):
+        self.callback = callback
+        return True
+
+    def stop_watching(self):
+        self.callback = None
+
+    def fire(self, hwnd):
+        """Simulate another window coming to the foreground."""
+        if self.callback is not None:
+            self.callback(hwnd)
+
+
+class FakeAudioController:
+    """audio.NullAudioController stand-in with a volume that can be read back."""
+
+    available = True
+
+    def __init__(self, level=0.5):
+        self.level = level
+        self.calls = collections.Counter()
+
+    def prewarm(self):
+        self.calls['prewarm'] += 1
+
+    def get_volume(self):
+        self.calls['get_volume'] += 1
+        return self.level
+
+    def set_volume(self, level):
+        self.calls['set_volume'] += 1
+        self.level = max(0.0, min(1.0, level))
+        return True
+
+    def invalidate(self):
+        self.calls['invalidate'] += 1
+
+    def close(self):
+        pass
+
+
+def install(window_count=40, fake_tk=True):
+    """Install the fake backends. Must run before blocker/keyboard_blocker are imported.
+
+    Returns the FakeWin32Gui instance so callers can tweak the fake desktop.
+    """
+    win32gui = FakeWin32Gui(window_count)
+    sys.modules['win32gui'] = win32gui
+    sys.modules['win32con'] = _make_win32con()
+    sys.modules['win32process'] = types.ModuleType('win32process')
+    if fake_tk:
+        sys.modules.update(_make_tkinter())
+
+    ctypes.windll = FakeWinDLL()
+    if not hasattr(ctypes, 'WINFUNCTYPE'):
+        ctypes.WINFUNCTYPE = ctypes.CFUNCTYPE
+    return win32gui
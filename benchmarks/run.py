@@ -0,0 +1,378 @@
+"""
+Headless benchmark suite for TimeGuard hot paths
+Runs against the fake Windows/Tk backends in fakes.py and compares with a stored baseline
+
+Usage:
+    python benchmarks/run.py                  # run and compare with baseline.json
+    python benchmarks/run.py --save-baseline  # record new baseline numbers (median of 5 runs)
+    python benchmarks/run.py -k keyboard      # only benchmarks whose name contains 'keyboard'
+
+Every benchmark is timed right after a fixed calibration loop, and results are
+compared relative to it, so a machine that is slower or busier as a whole does
+not show up as a regression. A benchmark over the threshold is measured again
+before it is reported.
+"""
+
+import argparse
+import ctypes
+import gc
+import json
+import logging
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+BASELINE_RUNS = 5  # Runs whose median --save-baseline records
+RETRIES = 2  # Extra measurements of a benchmark over the threshold
+
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+import fakes
+
+BENCHMARKS = []
+
+
+def benchmark(name, number=1000, repeat=7, tolerance=None):
+    """Register a setup function returning the zero-argument callable to time.
+
+    `tolerance` replaces --threshold for a benchmark the calibration loop
+    tracks poorly, such as one dominated by system calls.
+    """
+    def decorator(setup):
+        BENCHMARKS.append((name, setup, number, repeat, tolerance))
+        return setup
+    return decorator
+
+
+class Environment:
+    """Temporary working directory with a config.json, shared by all benchmarks."""
+
+    def __init__(self):
+        self.workdir = tempfile.mkdtemp(prefix='timeguard-bench-')
+        self.password = '123123'
+        self.config = {
+            # Cost 12 matches what create_default_config() produces
+            "admin_password": self._hash(self.password),
+            "enabled": False,  # Keep Blocker.__init__ from blocking on its own
+            "schedule": {str(i): {"start": "10:00", "end": "15:00"} for i in range(7)},
+            "language": "en",
+        }
+        with open(os.path.join(self.workdir, 'config.json'), 'w') as f:
+            json.dump(self.config, f, indent=2)
+        self._cwd = os.getcwd()
+        os.chdir(self.workdir)
+
+    def _hash(self, password):
+        try:
+            import bcrypt
+        except ImportError:
+            return ""
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(12)).decode('utf-8')
+
+    def make_blocker(self, enabled=True, window_manager=None, audio=None):
+        import blocker
+        import tkinter as tk
+        instance = blocker.Blocker(tk.Tk(), window_manager, audio)
+        config = dict(instance.config)
+        config["enabled"] = enabled
+        instance.set_config(config)
+        return instance
+
+    def close(self):
+        os.chdir(self._cwd)
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+@benchmark("blocker.is_time_to_block", number=20000)
+def bench_is_time_to_block(env):
+    return env.make_blocker().is_time_to_block
+
+
+@benchmark("schedule_engine.evaluate_many", number=5)
+def bench_evaluate_many(env):
+    import schedule_engine
+    # 2,000 machines sharing 50 distinct schedules, as in a school fleet
+    configs = {}
+    for machine in range(2000):
+        start = machine % 50 // 3
+        configs[f"pc-{machine}"] = {
+            "enabled": True,
+            "schedule": {str(day): {"start": f"{start + day % 2:02d}:{machine % 3 * 15:02d}", "end": "22:00"}
+                         for day in range(7)},
+        }
+    when = schedule_engine.datetime(2026, 3, 11, 12, 0)
+    return lambda: schedule_engine.evaluate_many(configs, when)
+
+
+# Mostly an os.stat() of config.json, which varies more than the calibration loop
+@benchmark("blocker.load_config", number=2000, tolerance=2.0)
+def bench_load_config(env):
+    import blocker
+    return blocker.load_config
+
+
+@benchmark("localization.get_text", number=50000)
+def bench_get_text(env):
+    from localization import get_localization
+    localization = get_localization()
+    return lambda: localization.get_text('access_restricted')
+
+
+@benchmark("localization.get_text_format", number=50000)
+def bench_get_text_format(env):
+    from localization import get_localization
+    localization = get_localization()
+    return lambda: localization.get_text('invalid_time_format', day='Monday')
+
+
+def synthetic_key_stream():
+    """Typing with the occasional blocked combination: Alt+Tab, Win, Ctrl+Esc."""
+    from keyboard_blocker import KeyboardBlocker
+    import key_policy as keys
+    down, up = KeyboardBlocker.WM_KEYDOWN, KeyboardBlocker.WM_KEYUP
+    sysdown, sysup = KeyboardBlocker.WM_SYSKEYDOWN, KeyboardBlocker.WM_SYSKEYUP
+    stream = []
+    for vk in b'HELLO WORLD':
+        stream += [(down, vk), (up, vk)]
+    stream += [(sysdown, keys.VK_LMENU), (sysdown, keys.VK_TAB),
+               (sysup, keys.VK_TAB), (up, keys.VK_LMENU),
+               (down, keys.VK_LWIN), (up, keys.VK_LWIN),
+               (down, keys.VK_LCONTROL), (down, keys.VK_ESCAPE),
+               (up, keys.VK_ESCAPE), (up, keys.VK_LCONTROL)]
+    return stream
+
+
+@benchmark("keyboard_blocker.hook_callback", number=200)
+def bench_keyboard_hook(env):
+    from keyboard_blocker import KeyboardBlocker, KBDLLHOOKSTRUCT
+    keyboard = KeyboardBlocker()
+    keyboard.hook_id = 1
+
+    stream = synthetic_key_stream()
+    structs = [KBDLLHOOKSTRUCT(vkCode=vk) for _, vk in stream]
+    events = [(w_param, ctypes.addressof(struct)) for (w_param, _), struct in zip(stream, structs)]
+    callback = keyboard._keyboard_hook_callback
+
+    def run():
+        for w_param, l_param in events:
+            callback(0, w_param, l_param)
+    run.per_call = len(events)
+    run.keepalive = structs
+    return run
+
+
+@benchmark("key_policy.decide", number=200)
+def bench_key_policy(env):
+    from keyboard_blocker import KeyboardBlocker
+    from key_policy import build_default_table, decide
+    table = build_default_table()
+    key_down = (KeyboardBlocker.WM_KEYDOWN, KeyboardBlocker.WM_SYSKEYDOWN)
+    events = [(vk, w_param in key_down) for w_param, vk in synthetic_key_stream()]
+
+    def run():
+        state = 0
+        for vk_code, down in events:
+            state, blocked = decide(table, state, vk_code, down)
+    run.per_call = len(events)
+    return run
+
+
+@benchmark("bcrypt.checkpw", number=1, repeat=3)
+def bench_bcrypt(env):
+    import bcrypt
+    hashed = env.config["admin_password"].encode('utf-8')
+    password = env.password.encode('utf-8')
+    return lambda: bcrypt.checkpw(password, hashed)
+
+
+@benchmark("blocker.enforce_topmost_full_pass", number=200)
+def bench_enforce_topmost(env):
+    instance = env.make_blocker()
+    instance.show_block_screen()
+    instance.block_window.run_pending()  # Starts enforcement
+
+    def run():
+        instance._enforce_topmost()
+        instance.block_window.after_cancel(instance.topmost_timer)
+    run.teardown = instance.hide_block_screen
+    return run
+
+
+@benchmark("blocker.window_event", number=2000)
+def bench_window_event(env):
+    manager = fakes.FakeWindowManager()
+    instance = env.make_blocker(window_manager=manager)
+    instance.show_block_screen()
+    instance.block_window.run_pending()
+
+    def run():
+        manager.fire(1234)  # Watcher thread side
+        instance.root.run_pending()  # Tk thread side
+    run.teardown = instance.hide_block_screen
+    return run
+
+
+@benchmark("blocker.show_hide_block_screen", number=1, repeat=5)
+def bench_show_hide(env):
+    instance = env.make_blocker()
+
+    def run():
+        instance.show_block_screen()
+        instance.hide_block_screen()
+    return run
+
+
+def calibrate(number=20000, repeat=5):
+    """Best seconds for a fixed pure-Python loop; the unit benchmarks are compared in."""
+    def work():
+        total = 0
+        values = {str(i): i for i in range(16)}
+        for i in range(number):
+            total += values.get(str(i & 15), 0)
+        return total
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        work()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure(setup, env, number, repeat):
+    """Return per-operation seconds for each repeat."""
+    func = setup(env)
+    per_call = getattr(func, 'per_call', 1)
+    func()  # Warm up caches and lazy imports
+    gc.collect()  # Do not charge this benchmark for garbage left by earlier ones
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - start) / (number * per_call))
+    teardown = getattr(func, 'teardown', None)
+    if teardown is not None:
+        teardown()
+    return timings
+
+
+def run_suite(env, name_filter):
+    """Measure every selected benchmark once. Returns {name: (timings, calibration)}."""
+    results = {}
+    for name, setup, number, repeat, _ in BENCHMARKS:
+        if name_filter not in name:
+            continue
+        try:
+            calibration = calibrate()
+            results[name] = (measure(setup, env, number, repeat), calibration)
+        except ImportError as e:
+            print(f"{name:40} skipped: {e}")
+    return results
+
+
+def remeasure(name, env):
+    """Measure one benchmark again. Returns (timings, calibration)."""
+    for bench_name, setup, number, repeat, _ in BENCHMARKS:
+        if bench_name == name:
+            calibration = calibrate()
+            return measure(setup, env, number, repeat), calibration
+
+
+def load_baseline(path):
+    """Return (calibration seconds, {name: best seconds}); (None, {}) if there is none."""
+    if not os.path.exists(path):
+        return None, {}
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return data.get('calibration'), data.get('benchmarks', {})
+
+
+def format_time(seconds):
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:9.2f} ms"
+    if seconds >= 1e-6:
+        return f"{seconds * 1e6:9.2f} us"
+    return f"{seconds * 1e9:9.1f} ns"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run TimeGuard benchmarks headless")
+    parser.add_argument('-k', dest='filter', default='', help="only run benchmarks whose name contains this")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline file to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="write results to the baseline file")
+    parser.add_argument('--runs', type=int,
+                        help=f"run the suite this many times and use the median (default 1, {BASELINE_RUNS} when saving)")
+    parser.add_argument('--threshold', type=float, default=1.5,
+                        help="flag a regression when best time exceeds baseline by this factor, "
+                             "both relative to the calibration loop")
+    parser.add_argument('--with-logging', action='store_true', help="keep TimeGuard logging enabled")
+    args = parser.parse_args(argv)
+
+    fakes.install()
+    if not args.with_logging:
+        logging.disable(logging.CRITICAL)
+
+    runs = args.runs or (BASELINE_RUNS if args.save_baseline else 1)
+    reference_calibration, baseline = load_baseline(args.baseline)
+
+    tolerances = {name: tolerance for name, _, _, _, tolerance in BENCHMARKS}
+    env = Environment()
+    regressions = []
+    try:
+        all_runs = [run_suite(env, args.filter) for _ in range(runs)]
+        # One calibration for the whole invocation: the median of those taken beside each benchmark
+        calibration = statistics.median(c for run in all_runs for _, c in run.values())
+        results = {}
+        print(f"{'benchmark':40} {'best':>12} {'median':>12} {'baseline':>12}  status")
+        for name in all_runs[0]:
+            scores = [min(run[name][0]) / run[name][1] for run in all_runs]
+            best = statistics.median(min(run[name][0]) for run in all_runs)
+            median = statistics.median(statistics.median(run[name][0]) for run in all_runs)
+            results[name] = statistics.median(scores) * calibration
+            reference = baseline.get(name)
+            if reference is None or not reference_calibration:
+                status, reference_text = "new", f"{'-':>12}"
+            else:
+                reference_score = reference / reference_calibration
+                threshold = tolerances[name] or args.threshold
+                ratio = statistics.median(scores) / reference_score
+                for _ in range(RETRIES if ratio > threshold else 0):
+                    timings, retry_calibration = remeasure(name, env)
+                    ratio = min(ratio, min(timings) / retry_calibration / reference_score)
+                    if ratio <= threshold:
+                        break
+                # The baseline as it would time on this machine right now
+                reference_text = format_time(reference_score * calibration)
+                status = f"{ratio:5.2f}x"
+                if ratio > threshold:
+                    status += " REGRESSION"
+                    regressions.append(name)
+            print(f"{name:40} {format_time(best)} {format_time(median)} "
+                  f"{reference_text}  {status}")
+    finally:
+        env.close()
+
+    if args.save_baseline:
+        # Keep entries this run did not measure, in this run's calibration units
+        scale = calibration / reference_calibration if reference_calibration else None
+        merged = {name: value * scale for name, value in baseline.items()} if scale else {}
+        merged.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump({'calibration': calibration, 'benchmarks': dict(sorted(merged.items()))}, f, indent=2)
+        print(f"Baseline written to {args.baseline} (median of {runs} run(s))")
+
+    if regressions:
+        print(f"{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""
+Block screen overlay for TimeGuard
+The fullscreen window is built once and kept withdrawn, so showing it is a
+deiconify and a few text updates instead of building the whole widget tree
+"""
+
+import tkinter as tk
+from localization import get_localization, _
+
+
+class BlockScreen:
+    def __init__(self, parent, on_unlock, on_configure=None, on_map=None):
+        self.parent = parent
+        self.on_unlock = on_unlock
+        self.on_configure = on_configure
+        self.on_map = on_map
+        self.language = None  # Language the texts were last applied in
+        self.window = None
+        self.build()
+
+    def build(self):
+        """Create the withdrawn window and its widgets."""
+        self.window = tk.Toplevel(self.parent)
+        self.window.withdraw()
+        self.window.attributes("-alpha", 0.85) # Make window semi-transparent
+        self.window.protocol("WM_DELETE_WINDOW", lambda: None) # Prevent closing
+        if self.on_configure:
+            # The fullscreen window is resized when the display changes. The
+            # binding also sees every child widget's <Configure>, so filter those
+            self.window.bind("<Configure>", self._on_configure)
+        if self.on_map:
+            self.window.bind("<Map>", self.on_map, add="+")
+
+        main_frame = tk.Frame(self.window, bg='black')
+        main_frame.pack(expand=True, fill=tk.BOTH)
+
+        center_frame = tk.Frame(main_frame, bg='black')
+        center_frame.pack(expand=True, fill=tk.BOTH)
+
+        self.title_label = tk.Label(center_frame,
+                                    font=("Helvetica", 36, "bold"),
+                                    bg='black',
+                                    fg='white')
+        self.title_label.pack(pady=(100, 40))
+
+        # Password input frame
+        password_frame = tk.Frame(center_frame, bg='black')
+        password_frame.pack(pady=30)
+
+        self.password_label = tk.Label(password_frame,
+                                       font=("Helvetica", 16),
+                                       bg='black',
+                                       fg='white')
+        self.password_label.pack(pady=(0, 10))
+
+        self.password_entry = tk.Entry(password_frame,
+                                       show='*',
+                                       font=("Helvetica", 18),
+                                       width=20,
+                                       bg='#34495e',
+                                       fg='white',
+                                       insertbackground='white',
+                                       relief='flat',
+                                       bd=5)
+        self.password_entry.pack(pady=10)
+
+        # Bind Enter key to check password
+        self.password_entry.bind('<Return>', lambda e: self.on_unlock())
+
+        self.unlock_button = tk.Button(center_frame,
+                                       command=self.on_unlock,
+                                       font=("Helvetica", 18, "bold"),
+                                       bg='#2c3e50',
+                                       fg='white',
+                                       activebackground='#3498db',
+                                       activeforeground='white',
+                                       relief='flat',
+                                       bd=0,
+                                       padx=40,
+                                       pady=15,
+                                       cursor='hand2')
+        self.unlock_button.pack(pady=30)
+
+        self.unlock_button.bind("<Enter>", lambda e: self.unlock_button.config(bg='#3498db'))
+        self.unlock_button.bind("<Leave>", lambda e: self.unlock_button.config(bg='#2c3e50'))
+
+        # Error message label (initially empty)
+        self.error_label = tk.Label(center_frame,
+                                    text="",
+                                    font=("Helvetica", 14),
+                                    bg='black',
+                                    fg='#e74c3c')
+        self.error_label.pack(pady=10)
+
+        self.language = None
+
+    def _on_configure(self, event):
+        if event.widget is self.window:
+            self.on_configure()
+
+    def apply_texts(self):
+        """Set the localized texts, if the language changed since the last time."""
+        language = get_localization().get_current_language()
+        if language == self.language:
+            return
+        self.window.title(_('access_restricted'))
+        self.title_label.config(text=_('access_restricted'))
+        self.password_label.config(text=_('admin_password') + ":")
+        self.unlock_button.config(text=_('unlock'))
+        self.language = language
+
+    def reset(self):
+        """Clear what the previous block left behind."""
+        self.password_entry.delete(0, tk.END)
+        self.error_label.config(text="")
+        self.unlock_button.config(bg='#2c3e50')
+
+    def show(self):
+        """Reset and map the overlay. Returns the Toplevel."""
+        if not self.window.winfo_exists():
+            self.build()  # Destroyed from outside, e.g. by Tk shutting down a child
+        self.apply_texts()
+        self.reset()
+        self.window.attributes("-fullscreen", True)
+        self.window.attributes("-topmost", True)
+        self.window.deiconify()
+        self.password_entry.focus_set()  # Set focus to password entry
+        return self.window
+
+    def hide(self):
+        """Withdraw the overlay and drop the typed password."""
+        if self.window.winfo_exists():
+            self.reset()
+            self.window.withdraw()
+
+    def destroy(self):
+        if self.window.winfo_exists():
+            self.window.destroy()
@@ -1,277 +1,32 @@
-import json
-import os
+import collections
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+import math
 import time
 import tkinter as tk
 from tkinter import messagebox
-import ctypes
-from ctypes import wintypes
-import gui
-import bcrypt
-import win32gui
-import win32con
-import win32process
-from localization import get_localization, _
+import schedule_engine
+from localization import _
 from keyboard_blocker import KeyboardBlocker
-from logger import log_info, log_debug, log_warning, log_error
-
-# Audio control imports
-try:
-    from comtypes import CLSCTX_ALL, CoInitialize
-    from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-    AUDIO_AVAILABLE = True
-    log_info("Audio control libraries loaded successfully")
-except ImportError as e:
-    log_warning(f"Audio control not available: {e}")
-    AUDIO_AVAILABLE = False
-
-CONFIG_FILE = "config.json"
-
-# Windows constants for SetWindowPos
-HWND_TOPMOST = -1
-HWND_NOTOPMOST = -2
-SWP_NOMOVE = 0x0002
-SWP_NOSIZE = 0x0001
-SWP_SHOWWINDOW = 0x0040
-SWP_NOACTIVATE = 0x0010
-
-def force_window_to_top(hwnd):
-    """Force a window to be on top of all other windows, including fullscreen apps."""
-    try:
-        user32 = ctypes.windll.user32
-        attached = False
-        current_thread_id = 0
-        foreground_thread_id = 0
-        
-        try:
-            # First, try to get the current foreground window
-            current_foreground = user32.GetForegroundWindow()
-            
-            # Get thread IDs
-            current_thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
-            foreground_thread_id = user32.GetWindowThreadProcessId(current_foreground, None)
-            
-            # Attach to the foreground thread to be able to set foreground window
-            if current_thread_id != foreground_thread_id and foreground_thread_id != 0:
-                user32.AttachThreadInput(current_thread_id, foreground_thread_id, True)
-                attached = True
-        except:
-            pass
-        
-        try:
-            # Set as topmost using SetWindowPos
-            user32.SetWindowPos(
-                hwnd,
-                HWND_TOPMOST,
-                0, 0, 0, 0,
-                SWP_NOMOVE | SWP_NOSIZE | SWP_SHOWWINDOW
-            )
-        except:
-            pass
-        
-        try:
-            # Bring to foreground
-            user32.SetForegroundWindow(hwnd)
-            user32.BringWindowToTop(hwnd)
-        except:
-            pass
-        
-        try:
-            # Set focus
-            user32.SetFocus(hwnd)
-        except:
-            pass
-        
-        # Detach from the foreground thread
-        if attached and current_thread_id != foreground_thread_id:
-            try:
-                user32.AttachThreadInput(current_thread_id, foreground_thread_id, False)
-            except:
-                pass
-        
-        return True
-    except:
-        return False
-
-def minimize_all_other_windows(exclude_hwnd):
-    """Minimize all windows except the specified one."""
-    try:
-        def callback(hwnd, exclude):
-            try:
-                if hwnd != exclude and win32gui.IsWindowVisible(hwnd):
-                    # Check if window is a normal window (not a system window)
-                    style = win32gui.GetWindowLong(hwnd, win32con.GWL_STYLE)
-                    if style & win32con.WS_VISIBLE and not (style & win32con.WS_DISABLED):
-                        # Get window class name to exclude system windows
-                        class_name = win32gui.GetClassName(hwnd)
-                        excluded_classes = ['Shell_TrayWnd', 'Progman', 'WorkerW', 'Button', 'tooltips_class32']
-                        if class_name not in excluded_classes:
-                            win32gui.ShowWindow(hwnd, win32con.SW_MINIMIZE)
-            except:
-                pass  # Ignore errors for individual windows
-            return True
-        
-        win32gui.EnumWindows(callback, exclude_hwnd)
-    except:
-        pass  # Silently ignore - not critical
-
-def stop_all_media():
-    """Stop all media playback using multiple methods."""
-    try:
-        user32 = ctypes.windll.user32
-        
-        # Method 1: Windows Media Key commands (most reliable)
-        VK_MEDIA_STOP = 0xB2
-        VK_MEDIA_PAUSE = 0xB3
-        
-        # Simulate media stop key press
-        user32.keybd_event(VK_MEDIA_STOP, 0, 0, 0)  # Key down
-        user32.keybd_event(VK_MEDIA_STOP, 0, 2, 0)  # Key up
-        
-        time.sleep(0.1)
-        
-        # Simulate media pause key press as backup
-        user32.keybd_event(VK_MEDIA_PAUSE, 0, 0, 0)  # Key down
-        user32.keybd_event(VK_MEDIA_PAUSE, 0, 2, 0)  # Key up
-        
-        # Method 2: App command approach (backup)
-        WM_APPCOMMAND = 0x319
-        APPCOMMAND_MEDIA_STOP = 13
-        APPCOMMAND_MEDIA_PAUSE = 14
-        
-        hwnd = user32.GetDesktopWindow()
-        user32.SendMessageW(hwnd, WM_APPCOMMAND, 0, APPCOMMAND_MEDIA_STOP << 16)
-        user32.SendMessageW(hwnd, WM_APPCOMMAND, 0, APPCOMMAND_MEDIA_PAUSE << 16)
-        
-        log_debug("Media stop commands sent")
-        
-    except Exception as e:
-        log_error(f" stopping media: {e}")
-
-def minimize_fullscreen_windows():
-    """Minimize all fullscreen windows to ensure the block screen is visible."""
-    try:
-        def callback(hwnd, extra):
-            if win32gui.IsWindowVisible(hwnd) and hwnd != extra:
-                # Check if window is fullscreen
-                try:
-                    rect = win32gui.GetWindowRect(hwnd)
-                    # Get screen dimensions
-                    screen_width = ctypes.windll.user32.GetSystemMetrics(0)
-                    screen_height = ctypes.windll.user32.GetSystemMetrics(1)
-                    
-                    # If window covers the entire screen, minimize it
-                    if (rect[2] - rect[0] >= screen_width and 
-                        rect[3] - rect[1] >= screen_height):
-                        win32gui.ShowWindow(hwnd, win32con.SW_MINIMIZE)
-                except:
-                    pass
-            return True
-        
-        # Get our block window handle to avoid minimizing it
-        desktop = win32gui.GetDesktopWindow()
-        win32gui.EnumWindows(callback, desktop)
-        
-    except Exception as e:
-        log_error(f" minimizing fullscreen windows: {e}")
-
-def get_volume_interface():
-    """Get the audio volume interface."""
-    if not AUDIO_AVAILABLE:
-        log_debug("Volume] Audio control libraries not available")
-        return None
-    
-    try:
-        # Initialize COM
-        try:
-            CoInitialize()
-        except:
-            pass  # Already initialized
-        
-        # Get default audio device
-        devices = AudioUtilities.GetSpeakers()
-        
-        # Check if devices has _dev attribute (newer pycaw)
-        if hasattr(devices, '_dev'):
-            log_debug("Volume] Using _dev attribute for newer pycaw")
-            interface = devices._dev.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-        else:
-            # Older pycaw API
-            log_debug("Volume] Using direct Activate for older pycaw")
-            interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-        
-        # Cast to IAudioEndpointVolume pointer
-        volume = ctypes.cast(interface, ctypes.POINTER(IAudioEndpointVolume))
-        log_debug(f"Volume] Successfully obtained volume interface")
-        return volume
-    except Exception as e:
-        log_debug(f"Volume] Error getting volume interface: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
-
-def get_current_volume():
-    """Get current system volume level (0.0 to 1.0)."""
-    try:
-        volume = get_volume_interface()
-        if volume:
-            current_volume = volume.GetMasterVolumeLevelScalar()
-            log_debug(f"Volume] Current volume level: {current_volume * 100:.0f}%")
-            return current_volume
-        else:
-            log_debug("Volume] Failed to get volume interface")
-    except Exception as e:
-        log_debug(f"Volume] Error getting current volume: {e}")
-        import traceback
-        traceback.print_exc()
-    return None
-
-def set_volume(level):
-    """Set system volume level (0.0 to 1.0)."""
-    try:
-        volume = get_volume_interface()
-        if volume:
-            # Clamp value between 0.0 and 1.0
-            level = max(0.0, min(1.0, level))
-            volume.SetMasterVolumeLevelScalar(level, None)
-            log_debug(f"Volume] Volume set to: {level * 100:.0f}%")
-            return True
-        else:
-            log_debug("Volume] Failed to get volume interface for setting")
-    except Exception as e:
-        log_debug(f"Volume] Error setting volume: {e}")
-        import traceback
-        traceback.print_exc()
-    return False
-
-def minimize_all_windows():
-    """Minimize all windows (show desktop)."""
-    try:
-        # Simulate Win+D to show desktop
-        # This is more reliable than manually minimizing windows
-        shell = ctypes.windll.shell32
-        shell.SHGetSpecialFolderPathW(0, None, 0, False)
-        
-        # Alternative: use keybd_event to simulate Win+D
-        user32 = ctypes.windll.user32
-        VK_LWIN = 0x5B
-        VK_D = 0x44
-        
-        # Press Win key
-        user32.keybd_event(VK_LWIN, 0, 0, 0)
-        time.sleep(0.05)
-        # Press D key
-        user32.keybd_event(VK_D, 0, 0, 0)
-        time.sleep(0.05)
-        # Release D key
-        user32.keybd_event(VK_D, 0, 2, 0)
-        time.sleep(0.05)
-        # Release Win key
-        user32.keybd_event(VK_LWIN, 0, 2, 0)
-        
-        log_debug("All windows minimized (desktop shown)")
-    except Exception as e:
-        log_error(f" minimizing all windows: {e}")
+from window_manager import get_window_manager
+from audio import get_audio_controller
+from block_screen import BlockScreen
+import key_policy
+import profiles
+from password_check import PasswordVerifier
+from config_store import CONFIG_FILE, create_default_config, get_config_store
+from logger import log_info, log_debug, log_warning, log_event, shutdown_logging
+
+# Upper bound for a single schedule timer, so suspend/resume and manual clock
+# changes are picked up even if the next transition is days away
+MAX_CHECK_INTERVAL_MS = 5 * 60 * 1000
+
+# How long a correct password on the block screen unlocks the computer
+TEMPORARY_UNLOCK_DURATION = timedelta(hours=1)
+
+# Window events keep the block screen on top; this slow full pass only
+# catches anything the events missed
+TOPMOST_SAFETY_NET_MS = 5000
 
 def is_valid_time_format(time_str):
     try:
@@ -280,284 +35,337 @@ def is_valid_time_format(time_str):
     except ValueError:
         return False
 
-def create_default_config():
-    password = "123123"
-    hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
-    return {
-        "admin_password": hashed_password.decode('utf-8'),
-        "enabled": True,
-        "schedule": {str(i): {"start": "10:00", "end": "15:00"} for i in range(7)}
-    }
-
 def load_config():
-    if not os.path.exists(CONFIG_FILE):
-        config = create_default_config()
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
-        return config
-    try:
-        with open(CONFIG_FILE, 'r') as f:
-            return json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return create_default_config()
+    """Return the shared config snapshot, re-reading config.json only if it changed."""
+    store = get_config_store()
+    store.refresh()
+    return store.get()
 
 class Blocker:
-    def __init__(self, root):
+    def __init__(self, root, window_manager=None, audio=None):
         self.root = root
-        self.config = load_config()
+        self.window_manager = window_manager or get_window_manager()
+        self.audio_controller = audio  # Resolved on first use, see _audio()
+        self.config = None  # The active profile's view of the config
+        self.source_config = None  # The ConfigStore snapshot it came from
+        self.profile_index = None
+        self.profile = None
+        self.profile_user = profiles.current_os_user()
+        self.compiled_schedule = None
+        self.keyboard_blocker = None  # Keyboard blocker instance
+        self.hotkey_policy = None  # Source of block_table, to skip recompiling
+        self.block_table = None  # Compiled key_policy table for the keyboard hook
+        self.set_config(load_config())
+        log_info(f"Using profile '{self.profile.name}' for user {self.profile_user}")
+        get_config_store().subscribe(self._on_config_changed)
         self.is_blocked = False
         self.block_window = None
         self.temporarily_unlocked_until = None
         self.timer = None
-        self.topmost_timer = None  # Timer for keeping window on top
-        self.keyboard_blocker = None  # Keyboard blocker instance
+        self.topmost_timer = None  # Safety-net timer for keeping window on top
+        self.block_hwnd = None  # Top-level handle of the block window
+        self.window_events = collections.deque()  # Handles reported by the window watcher
+        self.window_events_pending = False  # An _on_window_events call is already queued
         self.password_entry = None  # Password entry field on block screen
         self.error_label = None  # Error label on block screen
-        self.saved_volume = None  # Save volume level before blocking
+        self.saved_volume = None  # Volume before blocking; only used on the lockdown worker
+        # One worker runs the lockdown side effects and the volume restore in order
+        self.lockdown_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='Lockdown')
+        self.lockdown_started = None  # perf_counter() when the current block began
+        self.overlay_mapped = False
+        self.time_to_overlay = None  # Seconds from show_block_screen to the overlay being mapped
+        self.time_to_locked = None  # Seconds until muted, minimized and media stopped
+        self.password_verifier = PasswordVerifier(root)  # bcrypt checks off the Tk thread
+        # Built once and kept withdrawn; block_window is only set while it is shown
+        self.block_screen = BlockScreen(root, self.check_password_inline,
+                                        on_configure=self.window_manager.invalidate_screen_metrics,
+                                        on_map=self._on_overlay_mapped)
+        self._next_transition = None  # Cached result of next_transition()
 
         self.check_time()
 
-    def is_time_to_block(self):
-        if self.temporarily_unlocked_until and datetime.now() < self.temporarily_unlocked_until:
-            return False # Temporarily unlocked
-
-        if not self.config.get("enabled", False):
-            return False
+    def set_config(self, config):
+        """Replace the active config and select the current user's profile from it."""
+        self.source_config = config
+        self.profile_index = profiles.ProfileIndex(config)
+        self._select_profile()
+        self.set_hotkey_policy(config.get('hotkey_policy'))
+
+    def _select_profile(self):
+        self.profile = self.profile_index.get(self.profile_user)
+        self.config = self.profile.config
+        # Compiled on first use and shared through the schedule cache, so
+        # reloads that leave this profile's schedule alone reuse it
+        self.compiled_schedule = self.profile.compiled_schedule()
+        self._next_transition = None
+
+    def set_hotkey_policy(self, policy):
+        """Compile the config's hotkey_policy and hand it to the running hook."""
+        if self.block_table is not None and policy == self.hotkey_policy:
+            return
+        self.hotkey_policy = policy
+        if policy is None:
+            self.block_table = key_policy.build_default_table()
+        else:
+            try:
+                self.block_table = key_policy.compile_policy(policy)
+                log_info("Hotkey policy loaded from config")
+            except ValueError as e:
+                log_warning(f"Invalid hotkey_policy in config, using the default: {e}")
+                self.block_table = key_policy.build_default_table()
+        if self.keyboard_blocker is not None:
+            self.keyboard_blocker.set_policy(self.block_table)
+
+    def _on_config_changed(self, config):
+        """ConfigStore subscriber; may be called from the watcher thread."""
+        self.root.after(0, self._apply_config_change, config)
+
+    def _apply_config_change(self, config):
+        if config is self.source_config:
+            return  # Already applied
+        self.set_config(config)
+        self.check_time()
 
-        now = datetime.now()
-        weekday = str(now.weekday()) # Monday is 0, Sunday is 6
-        
-        schedule = self.config.get("schedule", {})
-        day_schedule = schedule.get(weekday)
+    def _audio(self):
+        """The audio controller; the default one is only created when first needed."""
+        if self.audio_controller is None:
+            self.audio_controller = get_audio_controller()
+        return self.audio_controller
 
-        if not day_schedule:
-            return True # Block if no schedule for today
+    def is_time_to_block(self):
+        return schedule_engine.is_blocked_at(self.compiled_schedule, datetime.now(),
+                                             self.temporarily_unlocked_until)
 
-        try:
-            start_time = datetime.strptime(day_schedule['start'], '%H:%M').time()
-            end_time = datetime.strptime(day_schedule['end'], '%H:%M').time()
-            current_time = now.time()
+    def is_time_to_block_batch(self, timestamps):
+        """Vectorized is_time_to_block() for an array of timestamps.
 
-            if start_time <= end_time:
-                return not (start_time <= current_time <= end_time)
-            else: # Overnight schedule
-                return not (current_time >= start_time or current_time <= end_time)
-        except (ValueError, KeyError):
-            return True # Block on error
+        Accepts NumPy datetime64 (local time), datetimes or epoch seconds and returns a
+        boolean block mask. The current temporary unlock, if any, is applied
+        as an interval. Requires NumPy.
+        """
+        unlock_windows = []
+        if self.temporarily_unlocked_until:
+            # is_blocked_batch converts the datetimes to match the timestamps
+            start = self.temporarily_unlocked_until - TEMPORARY_UNLOCK_DURATION
+            unlock_windows.append((start, self.temporarily_unlocked_until))
+        return schedule_engine.is_blocked_batch(self.compiled_schedule, timestamps, unlock_windows)
+
+    def next_transition(self):
+        """Return (moment, blocked) for the next block/unblock change, or None.
+
+        The value is cached until the moment passes, so callers such as the
+        tray can query it as often as they like.
+        """
+        now = datetime.now()
+        if self._next_transition is None or self._next_transition[0] <= now:
+            self._next_transition = schedule_engine.next_transition(
+                self.compiled_schedule, now, self.temporarily_unlocked_until)
+        return self._next_transition
 
     def check_time(self):
+        if self.timer:
+            self.root.after_cancel(self.timer)
+            self.timer = None
+        self._next_transition = None
+
         if self.is_time_to_block():
             if not self.is_blocked:
                 self.show_block_screen()
         else:
             if self.is_blocked:
                 self.hide_block_screen()
-        
-        self.timer = self.root.after(10000, self.check_time) # Check every 10 seconds
+
+        # Wake up exactly at the next transition instead of polling
+        delay = MAX_CHECK_INTERVAL_MS
+        transition = self.next_transition()
+        if transition:
+            seconds = (transition[0] - datetime.now()).total_seconds()
+            delay = max(1, min(delay, math.ceil(seconds * 1000)))
+            log_debug(f"Blocker] Next transition at {transition[0]:%Y-%m-%d %H:%M} "
+                      f"({'block' if transition[1] else 'unblock'})")
+        self.timer = self.root.after(delay, self.check_time)
 
     def show_block_screen(self):
         self.is_blocked = True
         if self.block_window is None or not self.block_window.winfo_exists():
             log_debug("Blocker] ===== STARTING BLOCK SCREEN =====")
+            log_event('block_shown')
+            # The overlay goes up first; everything else happens after it
+            self.lockdown_started = time.perf_counter()
+            self.overlay_mapped = False
             
-            # Save current volume level
-            log_debug("Blocker] Saving current volume level...")
-            self.saved_volume = get_current_volume()
-            if self.saved_volume is not None:
-                log_debug(f"Blocker] Saved volume: {self.saved_volume * 100:.0f}%")
-            else:
-                log_debug("Blocker] WARNING: Could not save current volume!")
-            
-            # Set volume to 0
-            log_debug("Blocker] Setting volume to 0%...")
-            success = set_volume(0.0)
-            if success:
-                log_debug("Blocker] Volume muted successfully")
-            else:
-                log_debug("Blocker] WARNING: Failed to mute volume!")
+            self.block_window = self.block_screen.show()
+            self.password_entry = self.block_screen.password_entry
+            self.error_label = self.block_screen.error_label
+            self.block_window.update_idletasks()  # Map it now rather than at the next idle
             
-            # Minimize all windows to show desktop
-            log_debug("Blocker] Minimizing all windows...")
-            minimize_all_windows()
-            
-            # Small delay to let desktop show
-            time.sleep(0.1)
-            
-            # Stop all media playback
-            log_debug("Blocker] Stopping media playback...")
-            stop_all_media()
-            minimize_fullscreen_windows()
-
             # Start keyboard blocker to prevent Win key and system shortcuts
             try:
                 if self.keyboard_blocker is None:
                     self.keyboard_blocker = KeyboardBlocker()
+                    self.keyboard_blocker.set_policy(self.block_table)
                 self.keyboard_blocker.start()
                 log_debug("Blocker] Keyboard blocking activated")
             except Exception as e:
                 log_debug(f"Blocker] Failed to start keyboard blocker: {e}")
-
-            self.block_window = tk.Toplevel(self.root)
-            self.block_window.title(_('access_restricted'))
-            self.block_window.attributes("-fullscreen", True)
-            self.block_window.attributes("-topmost", True)
-            self.block_window.attributes("-alpha", 0.85) # Make window semi-transparent
-            self.block_window.protocol("WM_DELETE_WINDOW", self.do_nothing) # Prevent closing
-            
-            # Lock workstation as an additional measure (optional, may fail without admin)
-            # Disabled - can cause issues and is not essential
-            # try:
-            #     ctypes.windll.user32.LockWorkStation()
-            # except:
-            #     pass
-
-            main_frame = tk.Frame(self.block_window, bg='black')
-            main_frame.pack(expand=True, fill=tk.BOTH)
-
-            center_frame = tk.Frame(main_frame, bg='black')
-            center_frame.pack(expand=True, fill=tk.BOTH)
-            
-            title_label = tk.Label(center_frame, 
-                                 text=_('access_restricted'), 
-                                 font=("Helvetica", 36, "bold"), 
-                                 bg='black', 
-                                 fg='white')
-            title_label.pack(pady=(100, 40))
-            
-            # Password input frame
-            password_frame = tk.Frame(center_frame, bg='black')
-            password_frame.pack(pady=30)
-            
-            password_label = tk.Label(password_frame, 
-                                    text=_('admin_password') + ":", 
-                                    font=("Helvetica", 16), 
-                                    bg='black', 
-                                    fg='white')
-            password_label.pack(pady=(0, 10))
-            
-            self.password_entry = tk.Entry(password_frame, 
-                                          show='*',
-                                          font=("Helvetica", 18),
-                                          width=20,
-                                          bg='#34495e',
-                                          fg='white',
-                                          insertbackground='white',
-                                          relief='flat',
-                                          bd=5)
-            self.password_entry.pack(pady=10)
-            self.password_entry.focus_set()  # Set focus to password entry
-            
-            # Bind Enter key to check password
-            self.password_entry.bind('<Return>', lambda e: self.check_password_inline())
             
-            unlock_button = tk.Button(center_frame, 
-                                    text=_('unlock'),
-                                    command=self.check_password_inline,
-                                    font=("Helvetica", 18, "bold"),
-                                    bg='#2c3e50',
-                                    fg='white',
-                                    activebackground='#3498db',
-                                    activeforeground='white',
-                                    relief='flat',
-                                    bd=0,
-                                    padx=40,
-                                    pady=15,
-                                    cursor='hand2')
-            unlock_button.pack(pady=30)
-            
-            def on_enter(e):
-                unlock_button.config(bg='#3498db')
-            
-            def on_leave(e):
-                unlock_button.config(bg='#2c3e50')
-            
-            unlock_button.bind("<Enter>", on_enter)
-            unlock_button.bind("<Leave>", on_leave)
-            
-            # Error message label (initially hidden)
-            self.error_label = tk.Label(center_frame,
-                                       text="",
-                                       font=("Helvetica", 14),
-                                       bg='black',
-                                       fg='#e74c3c')
-            self.error_label.pack(pady=10)
+            # Mute, minimize and stop media off the Tk thread
+            self.lockdown_executor.submit(self._lock_down, self._block_window_handle(), self.lockdown_started)
             
             # Start periodic topmost enforcement after window is shown
             self.block_window.after(100, self._start_topmost_enforcement)
 
+    def _block_window_handle(self):
+        """Top-level Win32 handle of the block window."""
+        hwnd = self.window_manager.top_level_handle(int(self.block_window.winfo_id()))
+        return self.window_manager.find_window(_('access_restricted')) or hwnd
+
+    def _on_overlay_mapped(self, event):
+        if event.widget is self.block_window and not self.overlay_mapped:
+            self.overlay_mapped = True
+            self.time_to_overlay = time.perf_counter() - self.lockdown_started
+            log_info(f"Block screen visible after {self.time_to_overlay * 1000:.0f} ms")
+
+    def _lockdown_current(self, started):
+        """False once the block that started at `started` is over or was replaced."""
+        return self.is_blocked and started == self.lockdown_started
+
+    def _lock_down(self, exclude_hwnd, started):
+        """Lockdown side effects, on the lockdown worker thread once the overlay is up."""
+        # The audio calls can each take CALL_TIMEOUT, so the user may have
+        # unlocked by the time a step runs; never touch their windows then
+        if not self._lockdown_current(started):
+            return
+        # Save current volume level
+        self.saved_volume = self._audio().get_volume()
+        if self.saved_volume is not None:
+            log_debug(f"Blocker] Saved volume: {self.saved_volume * 100:.0f}%")
+        else:
+            log_debug("Blocker] WARNING: Could not save current volume!")
+        
+        # Set volume to 0
+        if self._audio().set_volume(0.0):
+            log_debug("Blocker] Volume muted successfully")
+        else:
+            log_debug("Blocker] WARNING: Failed to mute volume!")
+        
+        # Minimize everything behind the overlay and stop media playback
+        if not self._lockdown_current(started):
+            return
+        self.window_manager.minimize_all_other_windows(exclude_hwnd)
+        if not self._lockdown_current(started):
+            return
+        self.window_manager.stop_all_media()
+        if not self._lockdown_current(started):
+            return
+        self.window_manager.minimize_fullscreen_windows(exclude_hwnd)
+        self.root.after(0, self._on_locked_down, started)
+
+    def _on_locked_down(self, started):
+        if not self._lockdown_current(started):
+            return  # Unblocked (or blocked again) while the worker was busy
+        self.time_to_locked = time.perf_counter() - started
+        log_info(f"Block screen fully locked after {self.time_to_locked * 1000:.0f} ms")
+        if self.block_hwnd:
+            self._bring_block_window_to_front()
+
+    def _restore_volume(self):
+        """Undo the mute from _lock_down; runs on the lockdown worker after it."""
+        if self.saved_volume is not None:
+            log_debug(f"Blocker] Restoring volume to {self.saved_volume * 100:.0f}%...")
+            success = self._audio().set_volume(self.saved_volume)
+            if success:
+                log_debug(f"Blocker] Volume restored successfully to {self.saved_volume * 100:.0f}%")
+            else:
+                log_debug("Blocker] WARNING: Failed to restore volume!")
+            self.saved_volume = None
+        else:
+            log_debug("Blocker] No saved volume to restore")
+
     def _start_topmost_enforcement(self):
-        """Start the periodic enforcement of topmost state."""
+        """Keep the block window on top: react to window events, plus a slow safety-net check."""
         if self.block_window and self.block_window.winfo_exists():
-            # Initial force to top
+            # Look the handle up once instead of on every check
+            self.block_hwnd = self._block_window_handle()
+            self.window_events.clear()
+            self.window_events_pending = False
+            self.window_manager.start_watching(self._on_window_event)
+            # Initial force to top, then the safety net every few seconds
             self._enforce_topmost()
-            # Start periodic timer (every 500ms)
-            self._schedule_topmost_check()
     
     def _schedule_topmost_check(self):
-        """Schedule the next topmost check."""
+        """Schedule the next safety-net check."""
         if self.is_blocked and self.block_window and self.block_window.winfo_exists():
-            self.topmost_timer = self.block_window.after(500, self._enforce_topmost)
+            self.topmost_timer = self.block_window.after(TOPMOST_SAFETY_NET_MS, self._enforce_topmost)
+    
+    def _on_window_event(self, hwnd):
+        """Window watcher callback, on the watcher thread: queue the handle for the Tk thread."""
+        self.window_events.append(hwnd)
+        if not self.window_events_pending:
+            # A burst of events becomes a single call on the Tk thread
+            self.window_events_pending = True
+            self.root.after(0, self._on_window_events)
+    
+    def _on_window_events(self):
+        """Deal with the windows that came up since the last call."""
+        self.window_events_pending = False
+        handles = set()
+        while self.window_events:
+            handles.add(self.window_events.popleft())
+        if not self.is_blocked or not self.block_hwnd:
+            return
+        for hwnd in handles:
+            self.window_manager.minimize_window(hwnd, self.block_hwnd)
+        self._bring_block_window_to_front()
+    
+    def _bring_block_window_to_front(self):
+        # Force window to top (may fail without admin rights)
+        try:
+            self.window_manager.force_window_to_top(self.block_hwnd)
+        except:
+            pass
+        
+        # Re-apply tkinter topmost attribute (safe)
+        try:
+            self.block_window.attributes("-topmost", True)
+            self.block_window.lift()
+        except:
+            pass
+        
+        # Focus the password entry
+        try:
+            if self.password_entry and self.password_entry.winfo_exists():
+                self.password_entry.focus_force()
+        except:
+            pass
     
     def _enforce_topmost(self):
-        """Force the block window to stay on top of all other windows."""
+        """Full check: minimize every other window and force the block window on top."""
         if not self.is_blocked or not self.block_window or not self.block_window.winfo_exists():
             return
         
-        try:
-            # Get the window handle
-            hwnd = int(self.block_window.winfo_id())
-            # Some tkinter versions need the parent window
-            # Try to get the actual top-level window handle
-            parent_hwnd = ctypes.windll.user32.GetParent(hwnd)
-            if parent_hwnd:
-                hwnd = parent_hwnd
-            
-            # Method 1: Use win32gui to get the window handle by title
+        if self.block_hwnd:
+            # Minimize all other windows first (may fail without admin rights)
             try:
-                hwnd = win32gui.FindWindow(None, _('access_restricted'))
+                self.window_manager.minimize_all_other_windows(self.block_hwnd)
             except:
                 pass
-            
-            if hwnd:
-                # Minimize all other windows first (may fail without admin rights)
-                try:
-                    minimize_all_other_windows(hwnd)
-                except:
-                    pass
-                
-                # Force window to top (may fail without admin rights)
-                try:
-                    force_window_to_top(hwnd)
-                except:
-                    pass
-                
-                # Re-apply tkinter topmost attribute (safe)
-                try:
-                    self.block_window.attributes("-topmost", True)
-                    self.block_window.lift()
-                except:
-                    pass
-                
-                # Focus the password entry
-                try:
-                    if self.password_entry and self.password_entry.winfo_exists():
-                        self.password_entry.focus_force()
-                except:
-                    pass
-            
-        except Exception as e:
-            # Silently ignore - this is not critical
-            pass
+            self._bring_block_window_to_front()
         
         # Schedule next check
         self._schedule_topmost_check()
 
     def hide_block_screen(self):
+        if self.is_blocked:
+            log_event('block_hidden')
         self.is_blocked = False
         
         log_debug("Blocker] ===== HIDING BLOCK SCREEN =====")
         
-        # Stop topmost enforcement timer
+        # Stop topmost enforcement
+        self.window_manager.stop_watching()
+        self.window_manager.reset_tracking()
+        self.block_hwnd = None
         if self.topmost_timer:
             try:
                 self.block_window.after_cancel(self.topmost_timer)
@@ -565,17 +373,8 @@ class Blocker:
                 pass
             self.topmost_timer = None
         
-        # Restore volume to previous level
-        if self.saved_volume is not None:
-            log_debug(f"Blocker] Restoring volume to {self.saved_volume * 100:.0f}%...")
-            success = set_volume(self.saved_volume)
-            if success:
-                log_debug(f"Blocker] Volume restored successfully to {self.saved_volume * 100:.0f}%")
-            else:
-                log_debug("Blocker] WARNING: Failed to restore volume!")
-            self.saved_volume = None
-        else:
-            log_debug("Blocker] No saved volume to restore")
+        # Restore volume to previous level, after the lockdown if it is still running
+        self.lockdown_executor.submit(self._restore_volume)
         
         # Stop keyboard blocker
         try:
@@ -585,9 +384,9 @@ class Blocker:
         except Exception as e:
             log_debug(f"Blocker] Error stopping keyboard blocker: {e}")
         
-        if self.block_window and self.block_window.winfo_exists():
-            self.block_window.destroy()
-            self.block_window = None
+        # Withdrawn rather than destroyed, so the next block only has to map it
+        self.block_screen.hide()
+        self.block_window = None
         
         log_debug("Blocker] Block screen hidden")
 
@@ -608,24 +407,39 @@ class Blocker:
             self._emergency_exit()
             return
         
-        hashed_password = self.config.get("admin_password", "").encode('utf-8')
+        wait = self.password_verifier.retry_after()
+        if wait > 0:
+            self.error_label.config(text=_('too_many_attempts', seconds=math.ceil(wait)))
+            self.password_entry.delete(0, tk.END)
+            return
         
-        try:
-            if hashed_password and bcrypt.checkpw(password.encode('utf-8'), hashed_password):
-                # Password is correct
-                self.hide_block_screen()
-                # Temporarily disable for 1 hour
-                self.temporarily_unlocked_until = datetime.now() + timedelta(hours=1)
-                messagebox.showinfo(_('unlocked'), _('unlocked_message'))
-            else:
-                # Wrong password
-                self.error_label.config(text=_('invalid_password'))
-                self.password_entry.delete(0, tk.END)
-                self.password_entry.focus_set()
-        except Exception as e:
-            log_error(f" checking password: {e}")
+        # Verify on the worker thread; repeated Enter presses are ignored meanwhile
+        hashed_password = self.config.get("admin_password", "")
+        if self.password_verifier.verify(password, hashed_password, self._on_inline_password_checked):
+            self.error_label.config(text=_('checking'))
+
+    def _on_inline_password_checked(self, ok, error):
+        """Apply the result of check_password_inline once bcrypt has finished."""
+        if not self.is_blocked or not self.password_entry or not self.password_entry.winfo_exists():
+            return  # The block screen went away while the check was running
+
+        if error is not None:
             self.error_label.config(text=_('error'))
             self.password_entry.delete(0, tk.END)
+        elif ok:
+            # Password is correct
+            log_event('unlock_success')
+            self.hide_block_screen()
+            # Temporarily disable for 1 hour
+            self.temporarily_unlocked_until = datetime.now() + TEMPORARY_UNLOCK_DURATION
+            self.check_time()  # Re-arm the timer for the end of the unlock
+            messagebox.showinfo(_('unlocked'), _('unlocked_message'))
+        else:
+            # Wrong password
+            log_event('unlock_failure')
+            self.error_label.config(text=_('invalid_password'))
+            self.password_entry.delete(0, tk.END)
+            self.password_entry.focus_set()
 
     def ask_for_unlock(self):
         """Legacy method - now handled inline in the block screen."""
@@ -636,21 +450,24 @@ class Blocker:
         self.root.after(0, self._open_settings_main_thread)
 
     def _open_settings_main_thread(self):
-        if gui.ask_password(self.config):
+        import gui  # Tk dialogs are only needed once someone opens settings
+        gui.ask_password(self.config, self.password_verifier, self._on_settings_password)
+
+    def _on_settings_password(self, ok):
+        if ok:
             # Hide the block screen to show the settings
             if self.is_blocked:
                 self.hide_block_screen()
             
-            # Create callback to reload config immediately after save
-            def reload_config():
-                self.config = load_config()
-                self.check_time()
-            
-            settings_win = gui.SettingsWindow(self.root, on_save_callback=reload_config)
+            # The store notifies us on save, so the blocker is updated immediately
+            import gui
+            # The password just checked is the active profile's, so only that profile is edited
+            profile = None if self.profile is self.profile_index.default else self.profile.name
+            settings_win = gui.SettingsWindow(self.root, profile=profile)
             self.root.wait_window(settings_win.window)
             
-            # Reload config and re-evaluate blocking status (in case window was closed without saving)
-            self.config = load_config()
+            # Re-evaluate blocking status (in case window was closed without saving)
+            self.set_config(load_config())
             self.check_time()
 
     def lock_now(self):
@@ -659,16 +476,26 @@ class Blocker:
         self.root.after(0, self._lock_now_main_thread)
 
     def _lock_now_main_thread(self):
+        log_event('lock_now')
         self.temporarily_unlocked_until = None
+        self._next_transition = None
         if not self.is_blocked:
             self.show_block_screen()
 
     def stop(self):
         """Stops the blocker's timer and keyboard blocker."""
+        if self.is_blocked:
+            # Close the journal's block interval; the next start would not know when it ended
+            log_event('block_hidden')
         if self.timer:
             self.root.after_cancel(self.timer)
         
-        # Stop topmost enforcement timer
+        self.password_verifier.shutdown()
+        self.lockdown_executor.shutdown(wait=False)
+        get_config_store().unsubscribe(self._on_config_changed)
+        
+        # Stop topmost enforcement
+        self.window_manager.stop_watching()
         if self.topmost_timer:
             try:
                 if self.block_window and self.block_window.winfo_exists():
@@ -699,6 +526,7 @@ class Blocker:
         To use: type 'EXIT_TIMEGUARD_NOW' in the password field
         """
         log_debug("Blocker] Emergency exit - stopping all services...")
+        log_event('emergency_exit')
         
         # Stop keyboard blocker
         try:
@@ -710,7 +538,7 @@ class Blocker:
         # Restore volume
         try:
             if self.saved_volume is not None:
-                set_volume(self.saved_volume)
+                self._audio().set_volume(self.saved_volume)
         except:
             pass
         
@@ -723,7 +551,18 @@ class Blocker:
         except:
             pass
         
+        # Write out any queued config change and lockout state; os._exit skips normal cleanup
+        try:
+            get_config_store().close()
+        except:
+            pass
+        try:
+            self.password_verifier.shutdown()
+        except:
+            pass
+        
         # Force quit the entire application
         log_debug("Blocker] Emergency exit complete. Goodbye!")
+        shutdown_logging()  # os._exit skips atexit, so flush the log queue now
         import os
         os._exit(0)  # Force immediate exit
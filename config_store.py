@@ -0,0 +1,215 @@
+"""
+Shared configuration store for TimeGuard
+Holds one parsed, read-only snapshot of config.json and re-reads the file only
+when its modification time or size changes. Writes are atomic, keep a last
+known-good backup and are coalesced by persistence.CoalescingWriter.
+"""
+
+import copy
+import os
+import threading
+from types import MappingProxyType
+from logger import log_debug, log_info, log_warning, log_error
+from persistence import BACKUP_SUFFIX, CoalescingWriter, atomic_write_json, read_json_with_backup
+
+CONFIG_FILE = "config.json"
+DEFAULT_PASSWORD = "123123"
+
+
+def create_default_config():
+    import bcrypt  # Only needed on first run
+    hashed_password = bcrypt.hashpw(DEFAULT_PASSWORD.encode('utf-8'), bcrypt.gensalt())
+    return {
+        "admin_password": hashed_password.decode('utf-8'),
+        "enabled": True,
+        "schedule": {str(i): {"start": "10:00", "end": "15:00"} for i in range(7)}
+    }
+
+
+def freeze(value):
+    """Return a read-only copy of parsed JSON: dicts become mapping proxies, lists tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """Inverse of freeze(): a plain, mutable copy suitable for editing and json.dump."""
+    if isinstance(value, MappingProxyType):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(item) for item in value]
+    return copy.deepcopy(value)
+
+
+class ConfigStore:
+    """
+    In-process owner of config.json.
+    get() returns the current immutable snapshot without touching the disk.
+    refresh() stats the file and re-parses it only if mtime or size changed;
+    a background watcher can call it periodically. Subscribers are called
+    with the new snapshot whenever it changes, on the thread that noticed the
+    change, so UI code must hand the work to its own thread.
+    """
+
+    def __init__(self, path=CONFIG_FILE, poll_interval=2.0, write_interval=2.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.writer = CoalescingWriter(path, interval=write_interval, on_written=self._on_written)
+        self.snapshot = None
+        self.signature = None
+        self.subscribers = []
+        self.lock = threading.RLock()
+        self.watch_stop = threading.Event()
+        self.watch_thread = None
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self):
+        """Return the current snapshot, loading the file the first time."""
+        if self.snapshot is None:
+            self.refresh()
+        return self.snapshot
+
+    def get_mutable(self):
+        """Return a plain dict copy of the current snapshot for editing."""
+        return thaw(self.get())
+
+    def refresh(self):
+        """Re-read the file if it changed on disk. Returns True if the snapshot changed."""
+        with self.lock:
+            signature = self._stat_signature()
+            if self.snapshot is not None and signature == self.signature:
+                return False
+
+            try:
+                # A missing file is restored from the backup just like a damaged one
+                config, used_backup = read_json_with_backup(self.path)
+            except (OSError, ValueError) as e:
+                if self.snapshot is not None:
+                    if signature is None:
+                        # Deleted and no backup to restore: put back what we are running with
+                        log_warning("Config file and its backup are missing, rewriting the current settings")
+                        self.writer.submit(thaw(self.snapshot))
+                    else:
+                        # Probably caught an editor mid-write; keep what we have
+                        log_warning(f"Config file unreadable, keeping previous settings: {e}")
+                    self.signature = signature
+                    return False
+                if signature is None:
+                    log_info(f"No config at {self.path}, creating the default one")
+                else:
+                    log_error(f" reading config and its backup, using defaults: {e}")
+                config = create_default_config()
+                self._write_defaults(config)
+                used_backup = False
+            else:
+                self.signature = signature
+                if used_backup:
+                    # Never fall back to the default password while a good copy exists
+                    log_warning("Config file missing or unreadable, restored last known-good copy")
+                    self.writer.submit(config)
+                elif self.snapshot is not None or not os.path.exists(self.path + BACKUP_SUFFIX):
+                    # A file that parses is the new known-good copy
+                    self._write_backup(config)
+
+            frozen = freeze(config)
+            if frozen == self.snapshot:
+                return False  # Our own write, or an edit that changed nothing
+            self.snapshot = frozen
+            snapshot = self.snapshot
+        log_debug("ConfigStore] Config loaded")
+        self._notify(snapshot)
+        return True
+
+    def _write_defaults(self, config):
+        # Written without a backup: generated defaults are never a known-good copy
+        try:
+            atomic_write_json(self.path, config)
+            log_info(f"Created default config at {self.path}")
+        except OSError as e:
+            log_error(f" writing default config: {e}")
+        self.signature = self._stat_signature()
+
+    def _write_backup(self, config):
+        try:
+            atomic_write_json(self.path + BACKUP_SUFFIX, config)
+        except OSError as e:
+            log_error(f" writing config backup: {e}")
+
+    def _on_written(self):
+        # Remember the file as written by us so the watcher does not re-read it.
+        # Runs on the writer thread and deliberately skips self.lock: refresh()
+        # may hold it while waiting for this very write to finish.
+        self.signature = self._stat_signature()
+
+    def save(self, config):
+        """Replace the snapshot, notify subscribers and queue the write.
+
+        The file is written in the background; call flush() to wait for it.
+        """
+        with self.lock:
+            self.snapshot = freeze(config)
+            snapshot = self.snapshot
+        self.writer.submit(thaw(snapshot))
+        self._notify(snapshot)
+
+    def flush(self):
+        """Write any queued change now. Raises OSError if the last write failed."""
+        self.writer.flush()
+
+    def subscribe(self, callback):
+        """Call callback(snapshot) every time the config changes."""
+        self.subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        if callback in self.subscribers:
+            self.subscribers.remove(callback)
+
+    def _notify(self, snapshot):
+        for callback in list(self.subscribers):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                log_error(f" in config subscriber: {e}")
+
+    def start_watching(self):
+        """Start a daemon thread that picks up external edits of the file."""
+        if self.watch_thread is not None:
+            return
+        self.watch_stop.clear()
+        self.watch_thread = threading.Thread(target=self._watch, name='ConfigWatcher', daemon=True)
+        self.watch_thread.start()
+
+    def stop_watching(self):
+        self.watch_stop.set()
+        self.watch_thread = None
+
+    def close(self):
+        """Stop watching and write out anything still queued."""
+        self.stop_watching()
+        self.writer.close()
+
+    def _watch(self):
+        while not self.watch_stop.wait(self.poll_interval):
+            try:
+                if self.refresh():
+                    log_info("Config file changed on disk, reloaded")
+            except Exception as e:
+                log_error(f" watching config: {e}")
+
+
+_store_instance = None
+
+def get_config_store():
+    global _store_instance
+    if _store_instance is None:
+        _store_instance = ConfigStore()
+    return _store_instance
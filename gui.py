@@ -1,20 +1,32 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk
-import json
+import math
 import bcrypt
-import blocker
+import schedule_engine
+from config_store import get_config_store
 from localization import get_localization, _
+from logger import log_event
 
 class SettingsWindow:
-    def __init__(self, parent, config_path="config.json", on_save_callback=None):
+    def __init__(self, parent, store=None, on_save_callback=None, profile=None):
         self.parent = parent
-        self.config_path = config_path
-        self.config = self.load_config()
+        self.store = store or get_config_store()
+        self.config = self.store.get_mutable()
         self.localization = get_localization()
         self.on_save_callback = on_save_callback
+        # With a profile (see profiles.py) schedule, enabled and password are
+        # read from and saved to config["profiles"][profile]; language stays global
+        self.profile = profile
+        if profile is not None:
+            self.settings = self.config.setdefault("profiles", {}).setdefault(profile, {})
+        else:
+            self.settings = self.config
 
         self.window = tk.Toplevel(parent)
-        self.window.title(_('settings_title'))
+        title = _('settings_title')
+        if profile is not None:
+            title = f"{title} - {profile}"
+        self.window.title(title)
         self.window.geometry("450x550")
         self.window.resizable(False, False)
 
@@ -38,13 +50,6 @@ class SettingsWindow:
             self.localization.set_language(new_language_code)
             messagebox.showinfo(_('success'), _('settings_saved'))
 
-    def load_config(self):
-        try:
-            with open(self.config_path, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return blocker.create_default_config()
-
     def create_widgets(self):
         main_frame = tk.Frame(self.window, padx=10, pady=10)
         main_frame.pack(fill=tk.BOTH, expand=True)
@@ -81,15 +86,11 @@ class SettingsWindow:
             
             tk.Label(day_frame, text=day, width=12, anchor='w').pack(side=tk.LEFT)
             
-            start_entry = tk.Entry(day_frame, width=8)
-            start_entry.pack(side=tk.LEFT, padx=5)
-            
-            tk.Label(day_frame, text="-").pack(side=tk.LEFT)
+            # Allowed windows as 'HH:MM-HH:MM', several separated by commas
+            windows_entry = tk.Entry(day_frame, width=30)
+            windows_entry.pack(side=tk.LEFT, padx=5, fill=tk.X, expand=True)
             
-            end_entry = tk.Entry(day_frame, width=8)
-            end_entry.pack(side=tk.LEFT, padx=5)
-            
-            self.time_entries[str(i)] = (start_entry, end_entry)
+            self.time_entries[str(i)] = windows_entry
 
         # Program status
         status_frame = tk.LabelFrame(main_frame, text=_('program_status'))
@@ -111,8 +112,14 @@ class SettingsWindow:
         save_button = tk.Button(main_frame, text=_('save'), command=self.save_settings)
         save_button.pack(pady=10)
 
+    def _setting(self, key, default):
+        # A profile inherits whatever it does not set from the top level
+        if key in self.settings:
+            return self.settings[key]
+        return self.config.get(key, default)
+
     def load_settings(self):
-        self.enabled_var.set(self.config.get("enabled", True))
+        self.enabled_var.set(self._setting("enabled", True))
         
         # Load language setting
         saved_language_code = self.config.get("language", self.localization.get_current_language())
@@ -120,26 +127,25 @@ class SettingsWindow:
             saved_language_name = self.language_names.get(saved_language_code, saved_language_code)
             self.language_var.set(saved_language_name)
         
-        schedule = self.config.get("schedule", {})
+        schedule = self._setting("schedule", {})
         for i in range(7):
             day_schedule = schedule.get(str(i), {"start": "00:00", "end": "00:00"})
-            self.time_entries[str(i)][0].insert(0, day_schedule["start"])
-            self.time_entries[str(i)][1].insert(0, day_schedule["end"])
+            self.time_entries[str(i)].insert(0, schedule_engine.format_windows(day_schedule))
 
     def save_settings(self):
         # Update schedule
         new_schedule = {}
         for i in range(7):
-            start_time = self.time_entries[str(i)][0].get()
-            end_time = self.time_entries[str(i)][1].get()
-            if not (blocker.is_valid_time_format(start_time) and blocker.is_valid_time_format(end_time)):
+            try:
+                windows = schedule_engine.parse_windows_text(self.time_entries[str(i)].get())
+            except ValueError:
                 messagebox.showerror(_('error'), _('invalid_time_format', day=self.days[i]))
                 return
-            new_schedule[str(i)] = {"start": start_time, "end": end_time}
-        self.config["schedule"] = new_schedule
+            new_schedule[str(i)] = schedule_engine.make_day_entry(windows)
+        self.settings["schedule"] = new_schedule
 
         # Update enabled status
-        self.config["enabled"] = self.enabled_var.get()
+        self.settings["enabled"] = self.enabled_var.get()
 
         # Save language preference (convert from name back to code)
         selected_language_name = self.language_var.get()
@@ -151,14 +157,17 @@ class SettingsWindow:
         new_password = self.new_password_entry.get()
         if new_password:
             hashed_password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt())
-            self.config["admin_password"] = hashed_password.decode('utf-8')
+            self.settings["admin_password"] = hashed_password.decode('utf-8')
             messagebox.showinfo(_('success'), _('password_changed'))
         
         try:
-            with open(self.config_path, 'w') as f:
-                json.dump(self.config, f, indent=2)
+            # Subscribers such as the blocker pick up the change immediately;
+            # flush so a failed write is reported here rather than lost
+            self.store.save(self.config)
+            self.store.flush()
+            log_event('settings_saved')
             
-            # Call the callback to update the blocker immediately
+            # Call the callback, if any, once the new config is in place
             if self.on_save_callback:
                 self.on_save_callback()
             
@@ -167,15 +176,41 @@ class SettingsWindow:
         except Exception as e:
             messagebox.showerror(_('error'), _('settings_save_error', error=str(e)))
 
-def ask_password(config):
+def ask_password(config, verifier, on_result):
+    """Ask for the admin password and report the outcome to on_result(ok).
+
+    The bcrypt check runs on the verifier's worker thread, so on_result is
+    called later from the Tk main loop rather than before this returns.
+    """
+    wait = verifier.retry_after()
+    if wait > 0:
+        messagebox.showwarning(_('error'), _('too_many_attempts', seconds=math.ceil(wait)))
+        on_result(False)
+        return
     password = simpledialog.askstring(_('password'), _('admin_password'), show='*')
     if password:
-        hashed_password = config.get("admin_password", "").encode('utf-8')
-        if hashed_password and bcrypt.checkpw(password.encode('utf-8'), hashed_password):
-            return True
+        hashed_password = config.get("admin_password", "")
         # First time setup or empty password
-        elif not hashed_password:
-             # This allows setting the password for the first time
-            return True
+        if not hashed_password:
+            # This allows setting the password for the first time
+            on_result(True)
+            return
+
+        def on_checked(ok, error):
+            if not ok:
+                messagebox.showwarning(_('error'), _('invalid_password'))
+            on_result(ok)
+
+        if verifier.verify(password, hashed_password, on_checked):
+            return
+        # Refused without checking: say why instead of calling the password wrong
+        wait = verifier.retry_after()
+        if wait > 0:
+            messagebox.showwarning(_('error'), _('too_many_attempts', seconds=math.ceil(wait)))
+        else:
+            # Another check (e.g. from the block screen) is still running
+            messagebox.showinfo(_('password'), _('checking'))
+        on_result(False)
+        return
     messagebox.showwarning(_('error'), _('invalid_password'))
-    return False
+    on_result(False)
@@ -0,0 +1,170 @@
+"""
+Keyboard hook statistics for TimeGuard
+Latency histogram and blocked-combination counters for the low-level keyboard hook
+
+The hook callback must not log or take locks (see keyboard_blocker.py), so it
+only writes into a preallocated ring buffer. A background thread drains the
+buffer into the histogram and counters and logs a summary now and then.
+"""
+
+import bisect
+import threading
+import time
+from array import array
+from key_policy import format_combination
+from logger import log_info, log_warning
+
+RING_SIZE = 4096  # Power of two; events between two drains before some are lost
+DRAIN_INTERVAL = 1.0  # seconds
+REPORT_INTERVAL = 300.0  # seconds between summary log lines
+
+# Windows' default when the registry does not say otherwise
+DEFAULT_HOOK_TIMEOUT_MS = 300
+
+# Upper bucket bounds in nanoseconds: 10 buckets per decade from 1 us to 10 s
+BUCKET_BOUNDS = [round(1000 * 10 ** (i / 10)) for i in range(71)]
+
+
+def hook_timeout_ms():
+    """LowLevelHooksTimeout from the registry, or the Windows default."""
+    try:
+        import winreg
+        with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Control Panel\Desktop") as key:
+            value, _ = winreg.QueryValueEx(key, "LowLevelHooksTimeout")
+            return int(value)
+    except (ImportError, OSError, ValueError):
+        return DEFAULT_HOOK_TIMEOUT_MS
+
+
+class LatencyHistogram:
+    """Log-scale histogram of durations in nanoseconds."""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.total = 0
+        self.max = 0
+
+    def add(self, duration):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS, duration)] += 1
+        self.total += 1
+        if duration > self.max:
+            self.max = duration
+
+    def percentile(self, fraction):
+        """Upper bound of the bucket holding the given fraction, in nanoseconds."""
+        if not self.total:
+            return 0
+        wanted = max(1, round(self.total * fraction))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted:
+                return BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+        return self.max
+
+
+class HookStats:
+    """
+    Single-writer ring buffer plus the aggregates built from it.
+    record() is called from the hook callback: it writes two preallocated
+    arrays and bumps a counter, nothing else. The drain thread is the only
+    reader and uses the counter to find the new entries.
+    """
+
+    def __init__(self, ring_size=RING_SIZE):
+        self.mask = ring_size - 1
+        self.durations = array('q', bytes(8 * ring_size))
+        self.combos = array('H', bytes(2 * ring_size))  # 0, or (state << 8 | vk) + 1 if blocked
+        self.written = 0  # Only ever incremented by record()
+        self.drained = 0
+        self.lost = 0
+        self.histogram = LatencyHistogram()
+        self.blocked = {}  # (state << 8 | vk) -> count
+        self.report_histogram = LatencyHistogram()  # Since the last summary line
+        self.lock = threading.Lock()  # Between the drain thread and get_stats(), never the hook
+        self.timeout_ms = hook_timeout_ms()
+        self.stop_event = None
+        self.thread = None
+
+    def record(self, duration, combo):
+        """Called from the hook callback: no allocation, no locks, no logging."""
+        index = self.written
+        self.durations[index & self.mask] = duration
+        self.combos[index & self.mask] = combo
+        self.written = index + 1
+
+    def drain(self):
+        """Fold new ring buffer entries into the histogram and counters."""
+        with self.lock:
+            written = self.written
+            start = self.drained
+            if written - start > self.mask + 1:
+                # The hook lapped us; the oldest entries were overwritten
+                self.lost += written - start - (self.mask + 1)
+                start = written - (self.mask + 1)
+            for index in range(start, written):
+                slot = index & self.mask
+                duration = self.durations[slot]
+                self.histogram.add(duration)
+                self.report_histogram.add(duration)
+                combo = self.combos[slot]
+                if combo:
+                    self.blocked[combo - 1] = self.blocked.get(combo - 1, 0) + 1
+            self.drained = written
+
+    def get_stats(self):
+        """Totals since the hook was first started; latencies in microseconds."""
+        self.drain()
+        with self.lock:
+            histogram = self.histogram
+            return {
+                'events': histogram.total,
+                'lost': self.lost,
+                'p50_us': histogram.percentile(0.50) / 1000,
+                'p99_us': histogram.percentile(0.99) / 1000,
+                'max_us': histogram.max / 1000,
+                'timeout_ms': self.timeout_ms,
+                'blocked': {format_combination(combo >> 8, combo & 0xFF): count
+                            for combo, count in sorted(self.blocked.items(), key=lambda item: -item[1])},
+            }
+
+    def report(self):
+        """Log a summary of the events since the previous report, if there were any."""
+        self.drain()
+        with self.lock:
+            histogram, self.report_histogram = self.report_histogram, LatencyHistogram()
+        if not histogram.total:
+            return
+        stats = self.get_stats()
+        blocked = ', '.join(f"{name} x{count}" for name, count in stats['blocked'].items()) or 'none'
+        log_info(f"Keyboard hook: {histogram.total} events, p50 {histogram.percentile(0.50) / 1000:.0f} us, "
+                 f"p99 {histogram.percentile(0.99) / 1000:.0f} us, max {histogram.max / 1000:.0f} us "
+                 f"(timeout {self.timeout_ms} ms); blocked since start: {blocked}")
+        if histogram.max > self.timeout_ms * 1_000_000 / 2:
+            log_warning(f"Keyboard hook took {histogram.max / 1_000_000:.0f} ms, more than half of "
+                        f"LowLevelHooksTimeout ({self.timeout_ms} ms); Windows may remove the hook")
+
+    def start(self):
+        """Start the drain thread (once)."""
+        if self.thread is not None:
+            return
+        # A fresh event per thread, so a quick stop()/start() cannot revive the old one
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(self.stop_event,), name='HookStats', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the drain thread and log what is left."""
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread = None
+        self.report()
+
+    def _run(self, stop_event):
+        next_report = time.monotonic() + REPORT_INTERVAL
+        while not stop_event.wait(DRAIN_INTERVAL):
+            self.drain()
+            if time.monotonic() >= next_report:
+                self.report()
+                next_report = time.monotonic() + REPORT_INTERVAL
@@ -0,0 +1,276 @@
+"""
+Event journal for TimeGuard
+Structured block/unlock history in fixed-size binary records with a per-day
+index, so queries seek straight to the days they need
+
+Files (in the logs directory):
+    events.bin  16-byte records: epoch seconds (float64), event code (uint8), padding
+    events.idx  8-byte entries: local date ordinal (int32), first record number (uint32)
+
+Usage:
+    python journal.py events --month 2026-03 --type unlock_success
+    python journal.py count unlock_success --month 2026-03
+    python journal.py blocked-minutes --from 2026-03-01 --to 2026-03-31
+"""
+
+import argparse
+import bisect
+import logging
+import os
+import struct
+import sys
+import threading
+from datetime import date, datetime, timedelta
+
+EVENT_TYPES = (
+    'block_shown',
+    'block_hidden',
+    'unlock_success',
+    'unlock_failure',
+    'settings_saved',
+    'lock_now',
+    'emergency_exit',
+    'policy_applied',
+    'app_started',
+)
+
+# Events that open or close a block screen interval
+STATE_EVENTS = ('block_shown', 'block_hidden', 'emergency_exit', 'app_started')
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES, start=1)}
+
+RECORD = struct.Struct('<dB7x')
+INDEX_ENTRY = struct.Struct('<iI')
+
+JOURNAL_FILE = 'events.bin'
+INDEX_FILE = 'events.idx'
+
+
+def default_journal_dir():
+    """The logs directory next to the executable or main.py, as used by logger.py."""
+    if getattr(sys, 'frozen', False):
+        base_dir = os.path.dirname(sys.executable)
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(base_dir, 'logs')
+
+
+class JournalWriter:
+    """Appends records and keeps the day index up to date."""
+
+    def __init__(self, directory):
+        self.journal_path = os.path.join(directory, JOURNAL_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+        self.lock = threading.Lock()
+        self.journal = None
+        self.index = None
+        self.record_count = 0
+        self.last_day = None
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        self.journal = open(self.journal_path, 'ab')
+        size = self.journal.seek(0, os.SEEK_END)
+        if size % RECORD.size:
+            # A crash mid-record left a partial tail; drop it
+            size -= size % RECORD.size
+            self.journal.truncate(size)
+        self.record_count = size // RECORD.size
+
+        self.index = open(self.index_path, 'ab')
+        index_size = self.index.seek(0, os.SEEK_END)
+        index_size -= index_size % INDEX_ENTRY.size
+        self.index.truncate(index_size)
+        if index_size:
+            with open(self.index_path, 'rb') as f:
+                f.seek(index_size - INDEX_ENTRY.size)
+                self.last_day, _ = INDEX_ENTRY.unpack(f.read(INDEX_ENTRY.size))
+
+    def append(self, timestamp, code):
+        with self.lock:
+            if self.journal is None:
+                self._open()
+            day = date.fromtimestamp(timestamp).toordinal()
+            # Index entries only move forward, so a clock set back does not break the bisect
+            if self.last_day is None or day > self.last_day:
+                self.index.write(INDEX_ENTRY.pack(day, self.record_count))
+                self.index.flush()
+                self.last_day = day
+            self.journal.write(RECORD.pack(timestamp, code))
+            self.journal.flush()
+            self.record_count += 1
+
+    def close(self):
+        with self.lock:
+            for f in (self.journal, self.index):
+                if f is not None:
+                    f.close()
+            self.journal = self.index = None
+
+
+class JournalHandler(logging.Handler):
+    """Logging handler that journals records carrying a `journal_event` attribute.
+
+    It is attached to the logger's QueueListener, so journal writes happen on
+    the listener thread like every other log write.
+    """
+
+    def __init__(self, directory):
+        super().__init__(logging.DEBUG)
+        self.writer = JournalWriter(directory)
+
+    def emit(self, record):
+        code = getattr(record, 'journal_event', None)
+        if code is None:
+            return
+        try:
+            self.writer.append(record.created, code)
+        except Exception:
+            self.handleError(record)
+
+    def close(self):
+        self.writer.close()
+        super().close()
+
+
+class JournalReader:
+    """Reads the records between two dates using the day index."""
+
+    def __init__(self, directory):
+        self.journal_path = os.path.join(directory, JOURNAL_FILE)
+        self.index_path = os.path.join(directory, INDEX_FILE)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return [], []
+        data = data[:len(data) - len(data) % INDEX_ENTRY.size]
+        days, starts = [], []
+        for day, start in INDEX_ENTRY.iter_unpack(data):
+            days.append(day)
+            starts.append(start)
+        return days, starts
+
+    def read(self, start_day, end_day):
+        """Yield (datetime, event_name) for records dated start_day..end_day inclusive."""
+        days, starts = self._load_index()
+        if not days:
+            return
+        first = bisect.bisect_left(days, start_day.toordinal())
+        last = bisect.bisect_right(days, end_day.toordinal())
+        if first >= len(days) or last == 0:
+            return
+        begin = starts[first]
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(begin * RECORD.size)
+                if last < len(days):
+                    data = f.read((starts[last] - begin) * RECORD.size)
+                else:
+                    data = f.read()
+        except FileNotFoundError:
+            return
+        data = data[:len(data) - len(data) % RECORD.size]
+        low = datetime.combine(start_day, datetime.min.time())
+        high = datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+        for timestamp, code in RECORD.iter_unpack(data):
+            when = datetime.fromtimestamp(timestamp)
+            if low <= when < high and 0 < code <= len(EVENT_TYPES):
+                yield when, EVENT_TYPES[code - 1]
+
+    def _last_state_day(self, before_day):
+        """Latest day before `before_day` with a record that opens or closes a block."""
+        days, _ = self._load_index()
+        for ordinal in reversed(days[:bisect.bisect_left(days, before_day.toordinal())]):
+            day = date.fromordinal(ordinal)
+            if any(event in STATE_EVENTS for _, event in self.read(day, day)):
+                return day
+        return None
+
+    def blocked_minutes_per_day(self, start_day, end_day):
+        """Return {date: minutes} of block screen time for each day in the range.
+
+        Reading starts at the last block event before start_day, so a block
+        that began days earlier is counted from midnight. A block still open
+        when the app starts again (crash, power loss) is closed at the last
+        record of the previous run.
+        """
+        totals = {start_day + timedelta(days=i): 0.0
+                  for i in range((end_day - start_day).days + 1)}
+        range_start = datetime.combine(start_day, datetime.min.time())
+        range_end = datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+        blocked_since = None
+        last_when = None
+        intervals = []
+        first_day = self._last_state_day(start_day) or start_day
+        for when, event in self.read(first_day, end_day):
+            if event == 'block_shown':
+                if blocked_since is None:
+                    blocked_since = when
+            elif event in ('block_hidden', 'emergency_exit') and blocked_since is not None:
+                intervals.append((blocked_since, when))
+                blocked_since = None
+            elif event == 'app_started' and blocked_since is not None:
+                intervals.append((blocked_since, last_when))
+                blocked_since = None
+            last_when = when
+        if blocked_since is not None:
+            intervals.append((blocked_since, min(datetime.now(), range_end)))
+
+        for begin, end in intervals:
+            begin, end = max(begin, range_start), min(end, range_end)
+            while begin < end:
+                next_midnight = datetime.combine(begin.date() + timedelta(days=1), datetime.min.time())
+                chunk_end = min(end, next_midnight)
+                totals[begin.date()] += (chunk_end - begin).total_seconds() / 60
+                begin = chunk_end
+        return totals
+
+
+def _parse_range(args):
+    if args.month:
+        first = datetime.strptime(args.month, '%Y-%m').date()
+        following = (first.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return first, following - timedelta(days=1)
+    today = date.today()
+    start = date.fromisoformat(args.date_from) if args.date_from else today - timedelta(days=6)
+    end = date.fromisoformat(args.date_to) if args.date_to else today
+    return start, end
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the TimeGuard event journal")
+    parser.add_argument('--dir', default=default_journal_dir(), help="logs directory holding the journal")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    def add_range(subparser):
+        subparser.add_argument('--month', help="YYYY-MM")
+        subparser.add_argument('--from', dest='date_from', help="YYYY-MM-DD (default: a week ago)")
+        subparser.add_argument('--to', dest='date_to', help="YYYY-MM-DD (default: today)")
+
+    events_parser = subparsers.add_parser('events', help="list events")
+    events_parser.add_argument('--type', choices=EVENT_TYPES)
+    add_range(events_parser)
+    count_parser = subparsers.add_parser('count', help="count events of one type")
+    count_parser.add_argument('type', choices=EVENT_TYPES)
+    add_range(count_parser)
+    add_range(subparsers.add_parser('blocked-minutes', help="total block screen minutes per day"))
+    args = parser.parse_args(argv)
+
+    reader = JournalReader(args.dir)
+    start, end = _parse_range(args)
+    if args.command == 'events':
+        for when, event in reader.read(start, end):
+            if args.type is None or event == args.type:
+                print(f"{when:%Y-%m-%d %H:%M:%S}  {event}")
+    elif args.command == 'count':
+        print(sum(1 for _, event in reader.read(start, end) if event == args.type))
+    else:
+        for day, minutes in reader.blocked_minutes_per_day(start, end).items():
+            print(f"{day.isoformat()}  {minutes:7.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Key blocking policy for the keyboard hook
+Pure Python (no ctypes), so the decision logic can be tested and benchmarked on any OS
+
+The hook keeps the pressed modifiers as a bitmask and looks every key-down up
+in a table with one 256-entry row per modifier combination, so deciding is a
+single index operation no matter how many combinations are blocked.
+"""
+
+# Modifier bits
+MOD_ALT = 1
+MOD_CTRL = 2
+MOD_SHIFT = 4
+MOD_WIN = 8
+MODIFIER_COMBINATIONS = 16
+
+# Virtual key codes
+VK_TAB = 0x09       # Tab key
+VK_SHIFT = 0x10     # Shift key (generic)
+VK_CONTROL = 0x11   # Control key (generic)
+VK_MENU = 0x12      # Alt key (generic)
+VK_ESCAPE = 0x1B    # Escape key
+VK_SPACE = 0x20     # Space key
+VK_DELETE = 0x2E    # Delete key
+VK_LWIN = 0x5B      # Left Windows key
+VK_RWIN = 0x5C      # Right Windows key
+VK_F4 = 0x73        # F4 key
+VK_LSHIFT = 0xA0    # Left Shift key
+VK_RSHIFT = 0xA1    # Right Shift key
+VK_LCONTROL = 0xA2  # Left Control key
+VK_RCONTROL = 0xA3  # Right Control key
+VK_LMENU = 0xA4     # Left Alt key
+VK_RMENU = 0xA5     # Right Alt key
+
+# vk code -> modifier bit (0 for ordinary keys)
+MODIFIER_BITS = bytearray(256)
+for _vk in (VK_MENU, VK_LMENU, VK_RMENU):
+    MODIFIER_BITS[_vk] = MOD_ALT
+for _vk in (VK_CONTROL, VK_LCONTROL, VK_RCONTROL):
+    MODIFIER_BITS[_vk] = MOD_CTRL
+for _vk in (VK_SHIFT, VK_LSHIFT, VK_RSHIFT):
+    MODIFIER_BITS[_vk] = MOD_SHIFT
+for _vk in (VK_LWIN, VK_RWIN):
+    MODIFIER_BITS[_vk] = MOD_WIN
+del _vk
+
+
+def new_table():
+    """An all-allow table: index (modifier_state << 8) | vk_code, 1 means block."""
+    return bytearray(MODIFIER_COMBINATIONS * 256)
+
+
+# Used when config.json has no "hotkey_policy" or it does not validate
+DEFAULT_POLICY = {
+    # Ctrl+Alt+Delete cannot be blocked by keyboard hooks, the system handles it
+    "block": ["Win", "Win+*", "Alt+Tab", "Alt+Esc", "Alt+F4", "Alt+Space",
+              "Ctrl+Esc", "Ctrl+Shift+Esc"],
+    "allow": [],
+}
+
+MODIFIER_NAMES = {
+    'alt': (MOD_ALT, (VK_MENU, VK_LMENU, VK_RMENU)),
+    'ctrl': (MOD_CTRL, (VK_CONTROL, VK_LCONTROL, VK_RCONTROL)),
+    'control': (MOD_CTRL, (VK_CONTROL, VK_LCONTROL, VK_RCONTROL)),
+    'shift': (MOD_SHIFT, (VK_SHIFT, VK_LSHIFT, VK_RSHIFT)),
+    'win': (MOD_WIN, (VK_LWIN, VK_RWIN)),
+}
+
+KEY_NAMES = {
+    'tab': VK_TAB, 'esc': VK_ESCAPE, 'escape': VK_ESCAPE, 'space': VK_SPACE,
+    'delete': VK_DELETE, 'del': VK_DELETE, 'enter': 0x0D, 'backspace': 0x08,
+    'insert': 0x2D, 'home': 0x24, 'end': 0x23, 'pageup': 0x21, 'pagedown': 0x22,
+    'left': 0x25, 'up': 0x26, 'right': 0x27, 'down': 0x28,
+    'printscreen': 0x2C, 'apps': 0x5D, 'lwin': VK_LWIN, 'rwin': VK_RWIN,
+}
+KEY_NAMES.update((chr(c).lower(), c) for c in range(ord('A'), ord('Z') + 1))
+KEY_NAMES.update((chr(c), c) for c in range(ord('0'), ord('9') + 1))
+KEY_NAMES.update((f'f{n}', 0x6F + n) for n in range(1, 25))
+
+
+# vk code -> display name, for reports
+VK_DISPLAY_NAMES = {
+    VK_TAB: 'Tab', VK_ESCAPE: 'Esc', VK_SPACE: 'Space', VK_DELETE: 'Delete',
+    0x0D: 'Enter', 0x08: 'Backspace', 0x2D: 'Insert', 0x24: 'Home', 0x23: 'End',
+    0x21: 'PageUp', 0x22: 'PageDown', 0x25: 'Left', 0x26: 'Up', 0x27: 'Right',
+    0x28: 'Down', 0x2C: 'PrintScreen', 0x5D: 'Apps',
+}
+VK_DISPLAY_NAMES.update((c, chr(c)) for c in range(ord('A'), ord('Z') + 1))
+VK_DISPLAY_NAMES.update((c, chr(c)) for c in range(ord('0'), ord('9') + 1))
+VK_DISPLAY_NAMES.update((0x6F + n, f'F{n}') for n in range(1, 25))
+
+
+def format_combination(state, vk_code):
+    """Name a (modifier_state, vk_code) pair the way policies spell it, e.g. "Alt+Tab"."""
+    bit = MODIFIER_BITS[vk_code]
+    names = [name.capitalize() for name, (flag, _) in MODIFIER_NAMES.items()
+             if name != 'control' and state & flag and flag != bit]
+    if bit:
+        # A modifier pressed on its own terms, e.g. the Win key itself
+        names.append(next(name.capitalize() for name, (flag, _) in MODIFIER_NAMES.items() if flag == bit))
+    else:
+        names.append(VK_DISPLAY_NAMES.get(vk_code, f'VK_{vk_code:02X}'))
+    return '+'.join(names)
+
+
+def parse_combination(text):
+    """
+    Parse "Alt+Tab", "Ctrl+Shift+Esc", "Win" or "Win+*" into
+    (required_modifiers, vk_codes). Raises ValueError for anything else.
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError(f"Invalid key combination: {text!r}")
+    *modifiers, key = [part.strip().lower() for part in text.split('+')]
+    required = 0
+    for name in modifiers:
+        if name not in MODIFIER_NAMES:
+            raise ValueError(f"Unknown modifier '{name}' in {text!r}")
+        required |= MODIFIER_NAMES[name][0]
+    if key == '*':
+        if not required:
+            raise ValueError(f"'*' needs at least one modifier in {text!r}")
+        return required, tuple(range(256))
+    if key in MODIFIER_NAMES:
+        # A modifier on its own, e.g. "Win" for the Start menu key
+        bit, vk_codes = MODIFIER_NAMES[key]
+        return required | bit, vk_codes
+    if key not in KEY_NAMES:
+        raise ValueError(f"Unknown key '{key}' in {text!r}")
+    return required, (KEY_NAMES[key],)
+
+
+def compile_policy(policy):
+    """
+    Build a decision table from {"block": [...], "allow": [...]}.
+    An entry applies whenever at least its modifiers are held; "allow"
+    entries are applied after "block" ones and take precedence.
+    Raises ValueError if the policy does not validate.
+    """
+    if not hasattr(policy, 'get'):
+        raise ValueError("hotkey_policy must be an object with 'block' and 'allow' lists")
+    unknown = set(policy) - {'block', 'allow'}
+    if unknown:
+        raise ValueError(f"Unknown hotkey_policy keys: {', '.join(sorted(unknown))}")
+    table = new_table()
+    for action, value in (('block', 1), ('allow', 0)):
+        entries = policy.get(action, ())
+        if isinstance(entries, str) or not isinstance(entries, (list, tuple)):
+            raise ValueError(f"hotkey_policy '{action}' must be a list")
+        for entry in entries:
+            required, vk_codes = parse_combination(entry)
+            for state in range(MODIFIER_COMBINATIONS):
+                if state & required == required:
+                    row = state << 8
+                    for vk_code in vk_codes:
+                        table[row | vk_code] = value
+    return table
+
+
+def build_default_table():
+    """The built-in policy: Win and anything pressed with it, Alt+Tab,
+    Alt+Esc, Alt+F4, Alt+Space, Ctrl+Esc and Ctrl+Shift+Esc."""
+    return compile_policy(DEFAULT_POLICY)
+
+
+def decide(table, state, vk_code, key_down):
+    """
+    Process one key event. Returns (new_modifier_state, blocked).
+    Modifier keys update the state before the lookup, so pressing Win
+    itself is already seen with the Win bit set.
+    """
+    bit = MODIFIER_BITS[vk_code]
+    if bit:
+        state = state | bit if key_down else state & ~bit
+    return state, key_down and table[(state << 8) | vk_code] == 1
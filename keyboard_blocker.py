@@ -6,7 +6,11 @@ Blocks system hotkeys (Win, Alt+Tab, etc.) during screen lock
 import ctypes
 from ctypes import wintypes, POINTER, Structure, c_int, c_long, c_longlong
 import atexit
-from logger import log_info, log_debug, log_error, log_blocked_key
+import threading
+import time
+from logger import log_info, log_debug, log_error
+from key_policy import build_default_table, decide
+from hook_stats import HookStats
 
 # LRESULT is a pointer-sized integer
 if ctypes.sizeof(ctypes.c_void_p) == 8:  # 64-bit
@@ -30,35 +34,17 @@ class KeyboardBlocker:
     Prevents access to Start Menu, Task Switcher, and other system functions.
     """
     
-    # Virtual key codes
-    VK_LWIN = 0x5B      # Left Windows key
-    VK_RWIN = 0x5C      # Right Windows key
-    VK_TAB = 0x09       # Tab key
-    VK_ESCAPE = 0x1B    # Escape key
-    VK_F4 = 0x73        # F4 key
-    VK_DELETE = 0x2E    # Delete key
-    VK_LCONTROL = 0xA2  # Left Control key
-    VK_RCONTROL = 0xA3  # Right Control key
-    VK_LSHIFT = 0xA0    # Left Shift key
-    VK_RSHIFT = 0xA1    # Right Shift key
-    VK_LMENU = 0xA4     # Left Alt key
-    VK_RMENU = 0xA5     # Right Alt key
-    VK_MENU = 0x12      # Alt key (generic)
-    VK_CONTROL = 0x11   # Control key (generic)
-    VK_SHIFT = 0x10     # Shift key (generic)
-    VK_D = 0x44         # D key (for Win+D)
-    VK_E = 0x45         # E key (for Win+E)
-    VK_R = 0x52         # R key (for Win+R)
-    VK_L = 0x4C         # L key (for Win+L)
-    VK_P = 0x50         # P key (for Win+P)
-    VK_SPACE = 0x20     # Space key
-    
     # Hook constants
     WH_KEYBOARD_LL = 13
     WM_KEYDOWN = 0x0100
     WM_KEYUP = 0x0101
     WM_SYSKEYDOWN = 0x0104
     WM_SYSKEYUP = 0x0105
+    WM_QUIT = 0x0012
+    PM_NOREMOVE = 0x0000
+    
+    # Seconds to wait for the hook thread to install or remove the hook
+    THREAD_TIMEOUT = 2.0
     
     # Flag for extended key (from KBDLLHOOKSTRUCT.flags)
     LLKHF_EXTENDED = 0x01
@@ -73,6 +59,10 @@ class KeyboardBlocker:
         # Define CallNextHookEx with proper types
         self.user32.CallNextHookEx.argtypes = [wintypes.HHOOK, c_int, wintypes.WPARAM, wintypes.LPARAM]
         self.user32.CallNextHookEx.restype = LRESULT
+        self.user32.GetMessageW.argtypes = [POINTER(wintypes.MSG), wintypes.HWND, wintypes.UINT, wintypes.UINT]
+        self.user32.GetMessageW.restype = wintypes.BOOL
+        self.user32.PostThreadMessageW.argtypes = [wintypes.DWORD, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+        self.user32.PostThreadMessageW.restype = wintypes.BOOL
         
         # Define the hook callback type
         self.LowLevelKeyboardProc = ctypes.WINFUNCTYPE(
@@ -85,131 +75,141 @@ class KeyboardBlocker:
         # Create callback function
         self.hook_callback = self.LowLevelKeyboardProc(self._keyboard_hook_callback)
         
-        # Track modifier key states
-        self.alt_pressed = False
-        self.ctrl_pressed = False
-        self.shift_pressed = False
-        self.win_pressed = False
+        # Pressed modifiers as key_policy MOD_* bits, and the block decision
+        # for every (modifiers, key) pair, see key_policy.py
+        self.modifier_state = 0
+        self.block_table = build_default_table()
+        
+        # Per-event latency and blocked combinations, filled in by the callback
+        self.stats = HookStats()
+        
+        # The hook lives on its own thread with its own message loop, so a busy
+        # Tk thread cannot delay keystrokes; start()/stop() may be called from any thread
+        self.control_lock = threading.Lock()
+        self.hook_thread = None
+        self.hook_thread_id = None
         
         # Register cleanup on exit
         atexit.register(self.stop)
         
         log_debug("KeyboardBlocker initialized")
     
+    def set_policy(self, block_table):
+        """Switch to another key_policy table; takes effect on the next key event.
+
+        The hook reads self.block_table once per event, so swapping the
+        reference is enough and the hook stays installed.
+        """
+        self.block_table = block_table
+    
     def start(self):
-        """Install the keyboard hook to start blocking keys."""
-        if self.hook_id is not None:
-            log_debug("KeyboardBlocker already running")
-            return True
-        
+        """Start the hook thread, which installs the keyboard hook. Returns True once it is installed."""
+        with self.control_lock:
+            if self.hook_thread is not None and self.hook_thread.is_alive():
+                log_debug("KeyboardBlocker already running")
+                return True
+            
+            ready = threading.Event()
+            self.hook_thread = threading.Thread(target=self._hook_thread_main, args=(ready,),
+                                                name='KeyboardHook', daemon=True)
+            self.hook_thread.start()
+            if not ready.wait(self.THREAD_TIMEOUT):
+                log_error("Keyboard hook thread did not start in time")
+                return False
+            return self.hook_id is not None
+    
+    def stop(self):
+        """Ask the hook thread to remove the hook and wait for it to finish."""
+        with self.control_lock:
+            thread, self.hook_thread = self.hook_thread, None
+            if thread is None:
+                return
+            
+            try:
+                if thread.is_alive():
+                    # WM_QUIT makes GetMessageW return 0 and ends the loop
+                    self.user32.PostThreadMessageW(self.hook_thread_id, self.WM_QUIT, 0, 0)
+                    thread.join(self.THREAD_TIMEOUT)
+                    if thread.is_alive():
+                        log_error("Keyboard hook thread did not stop in time")
+            except Exception as e:
+                log_error(f"KeyboardBlocker error stopping: {e}")
+    
+    def _hook_thread_main(self, ready):
+        """Install the hook, pump messages until WM_QUIT, then remove it."""
+        msg = wintypes.MSG()
         try:
+            self.hook_thread_id = self.kernel32.GetCurrentThreadId()
+            # Creates this thread's message queue, so PostThreadMessageW cannot miss it
+            self.user32.PeekMessageW(ctypes.byref(msg), None, 0, 0, self.PM_NOREMOVE)
+            
             # For low-level keyboard hooks, we can pass NULL (0) as hMod
             # This is the correct approach for WH_KEYBOARD_LL hooks
-            self.hook_id = self.user32.SetWindowsHookExW(
+            hook_id = self.user32.SetWindowsHookExW(
                 self.WH_KEYBOARD_LL,
                 self.hook_callback,
                 None,  # hMod can be NULL for low-level hooks
                 0      # dwThreadId = 0 means all threads
             )
-            
-            if self.hook_id:
-                log_info("Keyboard hook installed successfully")
-                return True
-            else:
-                # Get last error for debugging
-                error_code = self.kernel32.GetLastError()
-                log_error(f"Failed to install keyboard hook. Error code: {error_code}")
-                return False
-                
         except Exception as e:
             log_error(f"KeyboardBlocker error starting: {e}")
             import traceback
             traceback.print_exc()
-            return False
-    
-    def stop(self):
-        """Remove the keyboard hook to stop blocking keys."""
-        if self.hook_id is None:
+            ready.set()
             return
         
+        if not hook_id:
+            # Get last error for debugging
+            error_code = self.kernel32.GetLastError()
+            log_error(f"Failed to install keyboard hook. Error code: {error_code}")
+            ready.set()
+            return
+        
+        self.hook_id = hook_id
+        self.stats.start()
+        log_info("Keyboard hook installed successfully")
+        ready.set()
+        
         try:
-            self.user32.UnhookWindowsHookEx(self.hook_id)
-            self.hook_id = None
-            self.alt_pressed = False
-            self.ctrl_pressed = False
-            self.shift_pressed = False
-            self.win_pressed = False
-            log_info("Keyboard hook removed successfully")
+            # Windows calls the low-level hook from inside GetMessageW on this thread
+            while self.user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                self.user32.TranslateMessage(ctypes.byref(msg))
+                self.user32.DispatchMessageW(ctypes.byref(msg))
         except Exception as e:
-            log_error(f"KeyboardBlocker error stopping: {e}")
+            log_error(f"KeyboardBlocker message loop error: {e}")
+        finally:
+            try:
+                self.user32.UnhookWindowsHookEx(hook_id)
+                log_info("Keyboard hook removed successfully")
+            except Exception as e:
+                log_error(f"KeyboardBlocker error stopping: {e}")
+            self.hook_id = None
+            self.modifier_state = 0
+            self.stats.stop()
     
     def _keyboard_hook_callback(self, n_code, w_param, l_param):
         """
         Low-level keyboard hook callback.
         Intercepts keyboard events and blocks specific keys.
         """
+        started = time.perf_counter_ns()
         try:
             # Only process if n_code is HC_ACTION (0)
             if n_code >= 0:
-                # Get the virtual key code from the structure
-                kb_struct = ctypes.cast(l_param, POINTER(KBDLLHOOKSTRUCT)).contents
-                vk_code = kb_struct.vkCode
-                flags = kb_struct.flags
-                
-                is_key_down = w_param in (self.WM_KEYDOWN, self.WM_SYSKEYDOWN)
-                is_key_up = w_param in (self.WM_KEYUP, self.WM_SYSKEYUP)
-                
-                # Track modifier key states
-                if vk_code in (self.VK_MENU, self.VK_LMENU, self.VK_RMENU):
-                    self.alt_pressed = is_key_down
-                elif vk_code in (self.VK_CONTROL, self.VK_LCONTROL, self.VK_RCONTROL):
-                    self.ctrl_pressed = is_key_down
-                elif vk_code in (self.VK_SHIFT, self.VK_LSHIFT, self.VK_RSHIFT):
-                    self.shift_pressed = is_key_down
-                elif vk_code in (self.VK_LWIN, self.VK_RWIN):
-                    self.win_pressed = is_key_down
-                
-                # Check if this is a key press event
-                if is_key_down:
-                    
-                    # Block Windows keys (prevents Start menu and Win+Tab)
-                    if vk_code in (self.VK_LWIN, self.VK_RWIN):
-                        # Don't log here - can cause segfault in hook callback
-                        return 1  # Block the key
-                    
-                    # Block any key when Win is pressed (Win+Tab, Win+D, Win+E, etc.)
-                    if self.win_pressed:
-                        return 1
-                    
-                    # Block Alt+Tab (Task Switcher)
-                    if self.alt_pressed and vk_code == self.VK_TAB:
-                        return 1
-                    
-                    # Block Alt+Esc (Cycle windows)
-                    if self.alt_pressed and vk_code == self.VK_ESCAPE:
-                        return 1
-                    
-                    # Block Alt+F4 (Close window)
-                    if self.alt_pressed and vk_code == self.VK_F4:
-                        return 1
-                    
-                    # Block Alt+Space (Window menu)
-                    if self.alt_pressed and vk_code == self.VK_SPACE:
-                        return 1
-                    
-                    # Block Ctrl+Esc (Start menu)
-                    if self.ctrl_pressed and vk_code == self.VK_ESCAPE:
-                        return 1
-                    
-                    # Block Ctrl+Shift+Esc (Task Manager)
-                    if self.ctrl_pressed and self.shift_pressed and vk_code == self.VK_ESCAPE:
-                        return 1
-                    
-                    # Block Ctrl+Alt+Delete is not possible via keyboard hooks
-                    # (it's handled by the system at a lower level)
+                vk_code = KBDLLHOOKSTRUCT.from_address(l_param).vkCode & 0xFF
+                key_down = w_param == self.WM_KEYDOWN or w_param == self.WM_SYSKEYDOWN
+                self.modifier_state, blocked = decide(self.block_table, self.modifier_state, vk_code, key_down)
+                if blocked:
+                    # Don't log here - can cause segfault in hook callback;
+                    # the stats thread reports blocked combinations instead
+                    self.stats.record(time.perf_counter_ns() - started,
+                                      ((self.modifier_state << 8) | vk_code) + 1)
+                    return 1  # Block the key
             
             # Pass the event to the next hook
-            return self.user32.CallNextHookEx(self.hook_id, n_code, w_param, l_param)
+            result = self.user32.CallNextHookEx(self.hook_id, n_code, w_param, l_param)
+            self.stats.record(time.perf_counter_ns() - started, 0)
+            return result
             
         except Exception as e:
             # Don't log here - can cause issues in hook callback
@@ -219,6 +219,10 @@ class KeyboardBlocker:
             except:
                 return 0
     
+    def get_stats(self):
+        """Hook latency percentiles and blocked combination counts, see HookStats.get_stats()."""
+        return self.stats.get_stats()
+    
     def __del__(self):
         """Cleanup when object is destroyed."""
         self.stop()
@@ -228,6 +232,9 @@ class KeyboardBlocker:
 if __name__ == "__main__":
     import time
     
+    from logger import start_logging
+    start_logging()
+    
     print("Testing KeyboardBlocker...")
     print("Will block Windows key, Alt+Tab, Alt+Esc, Alt+F4 for 10 seconds")
     print("Press Ctrl+C to stop early")
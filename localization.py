@@ -3,30 +3,88 @@ import os
 import locale
 import ctypes
 import platform
+from string import Formatter
+from config_store import get_config_store
+
+TRANSLATIONS_DIR = os.path.join(os.path.dirname(__file__), 'translations')
+FALLBACK_LANGUAGE = 'uk'
+
+
+def discover_languages(translations_dir=TRANSLATIONS_DIR):
+    """Language codes with a translations/<code>.json file, fallback language first."""
+    try:
+        codes = sorted(name[:-5] for name in os.listdir(translations_dir) if name.endswith('.json'))
+    except OSError as e:
+        print(f"Error listing translations in {translations_dir}: {e}")
+        codes = []
+    if FALLBACK_LANGUAGE in codes:
+        codes.remove(FALLBACK_LANGUAGE)
+    return [FALLBACK_LANGUAGE] + codes
+
+
+def read_catalog(lang, translations_dir=TRANSLATIONS_DIR):
+    translation_file = os.path.join(translations_dir, f'{lang}.json')
+    try:
+        with open(translation_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"Translation file not found: {translation_file}")
+    except Exception as e:
+        print(f"Error loading translation file {translation_file}: {e}")
+    return {}
+
+
+def compile_catalog(catalog, fallback):
+    """
+    Resolve the fallback once and split the result into two flat maps:
+    texts (key -> finished string) and templates (key -> string with
+    {fields}), so get_text only formats strings that actually need it.
+    Templates stay strings: str.format_map parses these short texts in C as
+    fast as a Python renderer walks pre-parsed pieces.
+    """
+    texts = {key: text for key, text in fallback.items() if text and isinstance(text, str)}
+    texts.update((key, text) for key, text in catalog.items() if text and isinstance(text, str))
+    templates = {}
+    for key, text in texts.items():
+        try:
+            parts = list(Formatter().parse(text))
+        except ValueError:
+            continue  # Unbalanced braces, used as plain text
+        if any(field is not None for _, field, _, _ in parts):
+            templates[key] = text
+        elif '{' in text or '}' in text:
+            texts[key] = text.format()  # Only escaped braces: resolve them now
+    return texts, templates
+
 
 class Localization:
     def __init__(self):
-        self.current_language = 'uk'
-        self.translations = {}
-        self.supported_languages = ['uk', 'en', 'ru']
-        self.load_translations()
+        self.current_language = FALLBACK_LANGUAGE
+        self.supported_languages = discover_languages()
+        self.language_names = {}  # Read from each file's "language_name" on demand
+        self.fallback_catalog = read_catalog(FALLBACK_LANGUAGE)
+        self.catalog = ({}, {})  # (texts, templates) from compile_catalog
         self.detect_language()
+        self.load_translations()
     
     def detect_language(self):
         try:
-            config_file = os.path.join(os.path.dirname(__file__), 'config.json')
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    saved_language = config.get('language')
-                    if saved_language and saved_language in self.supported_languages:
-                        self.current_language = saved_language
-                        return
+            store = get_config_store()
+            store.subscribe(self._on_config_changed)
+            saved_language = store.get().get('language')
+            if saved_language and saved_language in self.supported_languages:
+                self.current_language = saved_language
+                return
         except Exception as e:
             print(f"Error loading language from config: {e}")
         
         self.detect_system_language()
 
+    def _on_config_changed(self, config):
+        language = config.get('language')
+        if language and language != self.current_language:
+            self.set_language(language)
+
     def detect_system_language(self):
         try:
             if platform.system() == 'Windows':
@@ -74,47 +132,34 @@ class Localization:
         self.current_language = 'uk'
     
     def load_translations(self):
-        translations_dir = os.path.join(os.path.dirname(__file__), 'translations')
-        
-        for lang in self.supported_languages:
-            translation_file = os.path.join(translations_dir, f'{lang}.json')
-            try:
-                if os.path.exists(translation_file):
-                    with open(translation_file, 'r', encoding='utf-8') as f:
-                        self.translations[lang] = json.load(f)
-                else:
-                    print(f"Translation file not found: {translation_file}")
-                    self.translations[lang] = {}
-            except Exception as e:
-                print(f"Error loading translation file {translation_file}: {e}")
-                self.translations[lang] = {}
+        """Compile the current language on top of the fallback; other languages stay on disk."""
+        if self.current_language == FALLBACK_LANGUAGE:
+            catalog = {}
+        else:
+            catalog = read_catalog(self.current_language)
+        # One reference swap, so threads calling get_text never see a mixed pair
+        self.catalog = compile_catalog(catalog, self.fallback_catalog)
     
     def get_text(self, key, **kwargs):
-        try:
-            if self.current_language in self.translations:
-                text = self.translations[self.current_language].get(key)
-                if text:
-                    if kwargs:
-                        return text.format(**kwargs)
-                    return text
-            
-            if 'uk' in self.translations:
-                text = self.translations['uk'].get(key)
-                if text:
-                    if kwargs:
-                        return text.format(**kwargs)
-                    return text
-            
-            return key
-            
-        except Exception as e:
-            print(f"Error getting translation for key '{key}': {e}")
+        texts, templates = self.catalog
+        text = texts.get(key)
+        if text is None:
             return key
+        if kwargs:
+            template = templates.get(key)
+            if template is not None:
+                try:
+                    return template.format_map(kwargs)
+                except Exception as e:
+                    print(f"Error getting translation for key '{key}': {e}")
+                    return key
+        return text
     
     def set_language(self, language):
         if language in self.supported_languages:
             old_language = self.current_language
             self.current_language = language
+            self.load_translations()
             print(f"Language changed from {old_language} to {language}")
             return True
         return False
@@ -126,12 +171,13 @@ class Localization:
         return self.supported_languages.copy()
     
     def get_language_name(self, lang_code):
-        language_names = {
-            'uk': 'Українська',
-            'en': 'English', 
-            'ru': 'Русский'
-        }
-        return language_names.get(lang_code, lang_code)
+        if lang_code not in self.language_names:
+            if lang_code == FALLBACK_LANGUAGE:
+                catalog = self.fallback_catalog
+            else:
+                catalog = read_catalog(lang_code)
+            self.language_names[lang_code] = catalog.get('language_name') or lang_code
+        return self.language_names[lang_code]
 
 
 _localization_instance = None
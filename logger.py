@@ -1,13 +1,20 @@
 """
 Logging module for TimeGuard
 Stores logs in ./logs/ directory next to the executable
+
+Callers only put records on a bounded queue; a QueueListener thread does the
+file and console I/O, including rotation, so logging never waits on disk.
+Nothing touches the disk until start_logging() is called; records logged
+before that wait in the queue.
 """
 
+import atexit
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from journal import EVENT_CODES, JournalHandler
 
 # Determine the base directory (where exe or main.py is located)
 if getattr(sys, 'frozen', False):
@@ -20,37 +27,116 @@ else:
 LOGS_DIR = os.path.join(BASE_DIR, 'logs')
 LOG_FILE = os.path.join(LOGS_DIR, 'timeguard.log')
 
-# Create logs directory if it doesn't exist
-os.makedirs(LOGS_DIR, exist_ok=True)
-
 # Create logger
 logger = logging.getLogger('TimeGuard')
 logger.setLevel(logging.DEBUG)
 
-# File handler with rotation (5 MB max, keep 3 backups)
-file_handler = RotatingFileHandler(
-    LOG_FILE,
-    maxBytes=5*1024*1024,  # 5 MB
-    backupCount=3,
-    encoding='utf-8'
-)
-file_handler.setLevel(logging.DEBUG)
-
-# Console handler
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.DEBUG)
-
 # Format: timestamp - level - message
 formatter = logging.Formatter(
     '[%(asctime)s] %(levelname)s: %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
-file_handler.setFormatter(formatter)
-console_handler.setFormatter(formatter)
 
-# Add handlers to logger
-logger.addHandler(file_handler)
-logger.addHandler(console_handler)
+# Records waiting for the listener thread. When it is full new records are
+# dropped (never blocking the caller) and a warning with the count is logged
+# as soon as there is room again.
+LOG_QUEUE_SIZE = 10000
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        if self.dropped:
+            summary = logging.LogRecord(
+                logger.name, logging.WARNING, __file__, 0,
+                f"{self.dropped} log records dropped (queue full)", None, None)
+            try:
+                self.queue.put_nowait(summary)
+                self.dropped = 0
+            except queue.Full:
+                pass
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class FlushingQueueListener(QueueListener):
+    """QueueListener whose stop() still works when the queue is full."""
+
+    def enqueue_sentinel(self):
+        # The base class uses put_nowait, which would raise on a full queue
+        self.queue.put(self._sentinel)
+
+
+log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+queue_handler = DroppingQueueHandler(log_queue)
+queue_handler.setLevel(logging.DEBUG)
+
+# Add the queue handler to logger; the real handlers live on the listener
+logger.addHandler(queue_handler)
+
+listener = None
+listener_handlers = ()
+logging_stopped = False
+
+
+def start_logging():
+    """Create the logs directory, open the handlers and start the listener thread.
+
+    Deferred so that startup can show the block screen before doing any log
+    file I/O. Safe to call more than once.
+    """
+    global listener, listener_handlers
+    if listener is not None or logging_stopped:
+        return
+
+    # Create logs directory if it doesn't exist
+    os.makedirs(LOGS_DIR, exist_ok=True)
+
+    # File handler with rotation (5 MB max, keep 3 backups)
+    file_handler = RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=5*1024*1024,  # 5 MB
+        backupCount=3,
+        encoding='utf-8'
+    )
+    file_handler.setLevel(logging.DEBUG)
+    file_handler.setFormatter(formatter)
+
+    # Console handler
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.DEBUG)
+    console_handler.setFormatter(formatter)
+
+    # Structured block/unlock history next to the text log, see journal.py
+    journal_handler = JournalHandler(LOGS_DIR)
+
+    listener_handlers = (file_handler, console_handler, journal_handler)
+    listener = FlushingQueueListener(log_queue, *listener_handlers, respect_handler_level=True)
+    listener.start()
+
+
+def shutdown_logging():
+    """Write out every queued record and stop the listener thread. Safe to call twice."""
+    global listener, logging_stopped
+    if logging_stopped:
+        return
+    start_logging()  # Records queued before logging started are still written
+    logging_stopped = True
+    current, listener = listener, None
+    current.stop()  # Drains the queue before returning
+    for handler in listener_handlers:
+        handler.flush()
+        handler.close()
+
+
+atexit.register(shutdown_logging)
 
 def get_logger():
     """Get the TimeGuard logger instance."""
@@ -72,6 +158,10 @@ def log_error(message):
     """Log an error message."""
     logger.error(message)
 
+def log_event(event):
+    """Log an event and record it in the event journal (see journal.EVENT_TYPES)."""
+    logger.info(f"Event: {event}", extra={'journal_event': EVENT_CODES[event]})
+
 def log_blocked_key(key_combo):
     """Log a blocked key combination (debug level to avoid spam)."""
     logger.debug(f"Blocked: {key_combo}")
@@ -1,20 +1,31 @@
-import tkinter as tk
-import blocker
-from pystray import MenuItem as item
-import pystray
-from PIL import Image, ImageDraw
+import startup
+startup.install_import_timer()
+
+with startup.step("import tkinter"):
+    import tkinter as tk
+with startup.step("import blocker"):
+    import blocker
 import threading
+from audio import get_audio_controller
+from config_store import get_config_store
 from localization import get_localization, _
+from logger import log_event, start_logging, shutdown_logging
 
 class App:
     def __init__(self):
-        self.root = tk.Tk()
-        self.root.withdraw()  # Hide the main window
-        self.localization = get_localization()
-        self.blocker = blocker.Blocker(self.root)
+        # Lets the journal close a block left open by a crash or power loss
+        log_event('app_started')
+        with startup.step("create Tk root"):
+            self.root = tk.Tk()
+            self.root.withdraw()  # Hide the main window
+        with startup.step("load localization"):
+            self.localization = get_localization()
+        with startup.step("first schedule check"):
+            self.blocker = blocker.Blocker(self.root)
         self.icon = None
 
     def create_image(self):
+        from PIL import Image, ImageDraw
         # Generate an image for the icon
         width = 64
         height = 64
@@ -31,6 +42,10 @@ class App:
         return image
 
     def setup_tray(self):
+        # pystray and PIL are imported here, on the tray thread, so they do
+        # not delay the first block check
+        from pystray import MenuItem as item
+        import pystray
         menu = (
             item(_('settings'), self.blocker.open_settings),
             item(_('block_now'), self.blocker.lock_now),
@@ -40,17 +55,37 @@ class App:
         self.icon = pystray.Icon("name", self.create_image(), _('app_title'), menu)
         self.icon.run()
 
+    def start_background_services(self):
+        """Everything that is not needed to show the block screen starts here."""
+        with startup.step("start logging"):
+            start_logging()
+        # Pick up edits to config.json made outside the settings window
+        get_config_store().start_watching()
+        # Fleet policy sync, only if config.json has a "policy_sync" section
+        from policy_client import start_policy_sync
+        start_policy_sync(get_config_store().get())
+        # Activate the audio device before the next block screen needs it
+        threading.Thread(target=lambda: get_audio_controller().prewarm(),
+                         name='AudioPreload', daemon=True).start()
+        startup.finish()
+
     def stop_app(self):
+        from policy_client import stop_policy_sync
+        stop_policy_sync()
+        get_config_store().close()
         self.blocker.stop()
+        get_audio_controller().close()
         if self.icon:
             self.icon.stop()
         self.root.quit()
+        shutdown_logging()
 
     def run(self):
         # Run tray icon in a separate thread
         tray_thread = threading.Thread(target=self.setup_tray, daemon=True)
         tray_thread.start()
-        
+
+        self.root.after(0, self.start_background_services)
         self.root.mainloop()
 
 if __name__ == "__main__":
@@ -0,0 +1,146 @@
+"""
+Password verification for TimeGuard
+Runs bcrypt checks on a worker thread so the Tk main loop never waits on them,
+and throttles attempts so guessing cannot keep a CPU core busy
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import json
+import time
+from logger import log_debug, log_warning, log_error
+from persistence import CoalescingWriter
+
+LOCKOUT_FILE = "lockout.json"
+
+
+def check_password(password, hashed_password):
+    """Return True if the password matches the stored bcrypt hash."""
+    if not hashed_password:
+        return False
+    import bcrypt  # Deferred to keep it off the startup path
+    return bcrypt.checkpw(password.encode('utf-8'), hashed_password.encode('utf-8'))
+
+
+class AttemptThrottle:
+    """
+    Limits how often bcrypt runs for password attempts.
+    After FREE_ATTEMPTS consecutive failures every further failure doubles the
+    lockout, up to MAX_DELAY. Independently, at most BUDGET_PER_MINUTE checks run
+    in any 60 seconds, which caps bcrypt CPU time no matter how fast input
+    arrives. The failure count and lockout end survive restarts; they are
+    written by a CoalescingWriter, so a wrong password never waits on the disk.
+    """
+
+    FREE_ATTEMPTS = 3
+    BASE_DELAY = 2.0  # seconds
+    MAX_DELAY = 300.0  # seconds
+    BUDGET_PER_MINUTE = 6
+
+    def __init__(self, state_file=LOCKOUT_FILE):
+        self.state_file = state_file
+        self.failures = 0
+        self.locked_until = 0.0  # Wall-clock time, so it is meaningful after a restart
+        self.recent_checks = deque(maxlen=self.BUDGET_PER_MINUTE)  # Monotonic timestamps
+        self.writer = CoalescingWriter(state_file, backup=False)
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            self.failures = int(state.get("failures", 0))
+            # Clamp so a clock moved backwards cannot extend the lockout indefinitely
+            self.locked_until = min(float(state.get("locked_until", 0.0)), time.time() + self.MAX_DELAY)
+        except FileNotFoundError:
+            pass
+        except (ValueError, TypeError, AttributeError) as e:
+            log_warning(f"Ignoring unreadable lockout state: {e}")
+
+    def _save(self):
+        # Write errors are logged by the writer
+        self.writer.submit({"failures": self.failures, "locked_until": self.locked_until})
+
+    def close(self):
+        """Write out any lockout state still queued."""
+        self.writer.close()
+
+    def retry_after(self):
+        """Seconds until the next check may run, 0 if one may run now."""
+        wait = max(0.0, self.locked_until - time.time())
+        if len(self.recent_checks) == self.BUDGET_PER_MINUTE:
+            wait = max(wait, self.recent_checks[0] + 60.0 - time.monotonic())
+        return wait
+
+    def record_check(self):
+        self.recent_checks.append(time.monotonic())
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.FREE_ATTEMPTS:
+            delay = min(self.MAX_DELAY, self.BASE_DELAY * 2 ** (self.failures - self.FREE_ATTEMPTS))
+            self.locked_until = time.time() + delay
+            log_warning(f"{self.failures} failed password attempts, locked for {delay:.0f} s")
+        self._save()
+
+    def record_success(self):
+        if self.failures or self.locked_until:
+            self.failures = 0
+            self.locked_until = 0.0
+            self._save()
+
+
+class PasswordVerifier:
+    """
+    Verifies passwords on a single background thread.
+    Only one check runs at a time and nothing is queued behind it; the result
+    is posted back to the Tk thread through root.after, the same way the tray
+    menu hands work to the UI.
+    """
+
+    def __init__(self, root, throttle=None):
+        self.root = root
+        self.throttle = throttle or AttemptThrottle()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='PasswordVerifier')
+        self.in_flight = False
+
+    def retry_after(self):
+        """Seconds the caller must wait before verify() will accept a password."""
+        return self.throttle.retry_after()
+
+    def verify(self, password, hashed_password, callback):
+        """Start a check and call callback(ok, error) on the Tk thread when done.
+
+        Returns False without starting anything if a check is already running
+        or the throttle does not allow one yet.
+        """
+        if self.in_flight:
+            log_debug("PasswordVerifier] Check already in progress, ignoring")
+            return False
+        if self.throttle.retry_after() > 0:
+            log_debug("PasswordVerifier] Throttled, ignoring")
+            return False
+        self.in_flight = True
+        self.throttle.record_check()
+        future = self.executor.submit(check_password, password, hashed_password)
+        future.add_done_callback(lambda f: self.root.after(0, self._finish, f, callback))
+        return True
+
+    def _finish(self, future, callback):
+        self.in_flight = False
+        error = future.exception()
+        if error is not None:
+            log_error(f" checking password: {error}")
+            callback(False, error)
+        else:
+            ok = future.result()
+            if ok:
+                self.throttle.record_success()
+            else:
+                self.throttle.record_failure()
+            callback(ok, None)
+
+    def shutdown(self):
+        """Stop accepting work. A check already running is left to finish on its own."""
+        self.executor.shutdown(wait=False)
+        self.throttle.close()
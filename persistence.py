@@ -0,0 +1,150 @@
+"""
+Crash-safe file persistence for TimeGuard
+Atomic JSON writes with a last known-good backup, and a writer that merges
+bursts of saves into at most one disk write per interval
+"""
+
+import json
+import os
+import threading
+import time
+from logger import log_debug, log_error
+
+BACKUP_SUFFIX = ".bak"
+
+
+def _fsync_directory(path):
+    # Makes the rename itself durable; directories cannot be opened on Windows
+    if os.name == 'nt':
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write_json(path, data, backup=False):
+    """Write JSON so that `path` holds either the old or the new content, never a mix.
+
+    The data goes to a temporary file in the same directory, is fsynced and
+    then renamed over `path`. With backup=True the same content is also kept
+    as `path + '.bak'`, the last known-good copy used by read_json_with_backup().
+    """
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    _fsync_directory(path)
+    if backup:
+        atomic_write_json(path + BACKUP_SUFFIX, data)
+
+
+def read_json_with_backup(path):
+    """Read JSON from `path`, falling back to the last known-good backup.
+
+    Returns (data, used_backup). Raises the original error if neither file
+    can be read.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f), False
+    except (OSError, ValueError) as error:
+        try:
+            with open(path + BACKUP_SUFFIX, 'r', encoding='utf-8') as f:
+                return json.load(f), True
+        except (OSError, ValueError):
+            raise error
+
+
+class CoalescingWriter:
+    """
+    Background writer for one JSON file.
+    submit() only records the latest data. The first submission after a quiet
+    period is written straight away; anything submitted within `interval`
+    seconds of a write is merged and written once when the interval ends.
+    """
+
+    def __init__(self, path, interval=2.0, backup=True, on_written=None):
+        self.path = path
+        self.interval = interval
+        self.backup = backup
+        self.on_written = on_written  # Called after each successful write
+        self.pending = None
+        self.last_error = None
+        self.last_write = 0.0
+        self.condition = threading.Condition()
+        self.write_lock = threading.Lock()
+        self.thread = None
+        self.closed = False
+
+    def submit(self, data):
+        """Queue `data` to be written. Later submissions replace earlier unwritten ones."""
+        with self.condition:
+            self.pending = data
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='CoalescingWriter', daemon=True)
+                self.thread.start()
+            self.condition.notify()
+
+    def _take_pending(self):
+        with self.condition:
+            data, self.pending = self.pending, None
+            return data
+
+    def _write_pending(self):
+        # Taking the data under write_lock keeps an older snapshot from landing after a newer one
+        with self.write_lock:
+            data = self._take_pending()
+            if data is None:
+                return
+            try:
+                atomic_write_json(self.path, data, backup=self.backup)
+                self.last_error = None
+                self.last_write = time.monotonic()
+                log_debug(f"Persistence] Wrote {self.path}")
+                if self.on_written:
+                    self.on_written()
+            except OSError as e:
+                self.last_error = e
+                log_error(f" writing {self.path}: {e}")
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.closed and self.pending is None:
+                    return
+                # Wait out the rest of the interval so a burst becomes one write
+                wait = self.last_write + self.interval - time.monotonic()
+                while wait > 0 and not self.closed:
+                    self.condition.wait(wait)
+                    wait = self.last_write + self.interval - time.monotonic()
+            self._write_pending()
+
+    def flush(self):
+        """Write any pending data now, on the calling thread. Raises the last write error."""
+        self._write_pending()
+        if self.last_error is not None:
+            raise self.last_error
+
+    def close(self):
+        """Flush pending data and stop the background thread."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        try:
+            self.flush()
+        except OSError:
+            pass  # Already logged
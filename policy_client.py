@@ -0,0 +1,200 @@
+"""
+Fleet policy sync for TimeGuard
+Pulls schedule, enabled flag and password hash from a policy server (see
+policy_server.py) and applies them through the config store, the same path
+the settings window uses
+
+Enabled by a "policy_sync" section in config.json:
+    "policy_sync": {"url": "http://server:8765/policy", "token": "..."}
+
+Requests carry If-None-Match with the last ETag and ask the server to hold
+them open until the policy changes (long-polling), so an idle fleet costs one
+open connection per machine. A server that still knows the client's ETag
+answers with only the keys that changed. Failures back off exponentially with
+full jitter, so a restarted server is not hit by every machine at once.
+"""
+
+import http.client
+import json
+import random
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from config_store import get_config_store, thaw
+import schedule_engine
+from logger import log_debug, log_info, log_warning, log_error, log_event
+
+# Keys of config.json that the policy server owns
+SYNCED_KEYS = ('schedule', 'enabled', 'admin_password')
+
+DEFAULT_WAIT = 55  # Seconds the server may hold a request open
+DEFAULT_MIN_INTERVAL = 30  # Seconds between requests when the server answers at once
+BACKOFF_BASE = 2  # Seconds; doubles with every failure in a row
+BACKOFF_CAP = 300
+START_JITTER = 10  # Spread the first request of a fleet that boots together
+
+
+def validate_policy(policy):
+    """Check the synced keys of a policy document. Raises ValueError if one is invalid."""
+    if not isinstance(policy, dict):
+        raise ValueError("policy must be an object")
+    if 'enabled' in policy and not isinstance(policy['enabled'], bool):
+        raise ValueError("'enabled' must be true or false")
+    if 'admin_password' in policy:
+        password = policy['admin_password']
+        # An empty hash would let anyone set the password on the block screen
+        if not isinstance(password, str) or not password.startswith('$2'):
+            raise ValueError("'admin_password' must be a bcrypt hash")
+    if 'schedule' in policy:
+        schedule = policy['schedule']
+        if not isinstance(schedule, dict):
+            raise ValueError("'schedule' must be an object")
+        for day, entry in schedule.items():
+            if day not in {str(i) for i in range(7)}:
+                raise ValueError(f"Unknown schedule day {day!r}")
+            try:
+                windows = entry.get('windows', [entry]) if entry else []
+                for window in windows:
+                    schedule_engine.parse_time(window['start'])
+                    schedule_engine.parse_time(window['end'])
+            except (AttributeError, KeyError, TypeError, ValueError):
+                raise ValueError(f"Invalid schedule for day {day}: {entry!r}")
+
+
+def backoff_delay(failures, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full-jitter exponential backoff: uniform over [0, min(cap, base * 2**failures)]."""
+    return random.uniform(0, min(cap, base * 2 ** failures))
+
+
+class PolicyClient:
+    """
+    Background thread that long-polls the policy server.
+    A changed policy is merged into the current config and saved with
+    store.save(), so subscribers such as the blocker reload it immediately.
+    """
+
+    def __init__(self, settings, store=None):
+        self.url = settings['url']
+        self.token = settings.get('token')
+        self.wait = int(settings.get('wait', DEFAULT_WAIT))
+        self.min_interval = float(settings.get('min_interval', DEFAULT_MIN_INTERVAL))
+        self.client_id = settings.get('client_id') or socket.gethostname()
+        self.store = store or get_config_store()
+        self.etag = None  # ETag of the policy applied last
+        self.failures = 0
+        self.stop_event = None
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(self.stop_event,),
+                                       name='PolicySync', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        # A request in flight is abandoned; the thread is a daemon
+        if self.thread is None:
+            return
+        self.stop_event.set()
+        self.thread = None
+
+    def _request(self):
+        query = urllib.parse.urlencode({'wait': self.wait, 'client': self.client_id})
+        separator = '&' if '?' in self.url else '?'
+        request = urllib.request.Request(f"{self.url}{separator}{query}")
+        if self.etag:
+            request.add_header('If-None-Match', self.etag)
+        if self.token:
+            request.add_header('Authorization', f"Bearer {self.token}")
+        try:
+            with urllib.request.urlopen(request, timeout=self.wait + 15) as response:
+                return response.status, response.headers.get('ETag'), json.load(response)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return 304, self.etag, None
+            raise
+
+    def poll_once(self):
+        """One request/apply round. Returns True if the config was changed."""
+        status, etag, body = self._request()
+        if status == 304:
+            return False
+        if not isinstance(body, dict) or not isinstance(body.get('policy'), dict):
+            raise ValueError("response has no 'policy' object")
+        policy = body['policy']
+        if not body.get('delta'):
+            # A full document only owns the synced keys
+            policy = {key: policy[key] for key in SYNCED_KEYS if key in policy}
+        changed = self.apply(policy)
+        self.etag = etag
+        return changed
+
+    def apply(self, policy):
+        """Merge the synced keys of `policy` into the config. Returns True if anything changed."""
+        validate_policy(policy)
+        current = self.store.get()
+        changes = {key: value for key, value in policy.items()
+                   if key in SYNCED_KEYS and thaw(current.get(key)) != value}
+        if not changes:
+            return False
+        config = self.store.get_mutable()
+        config.update(changes)
+        self.store.save(config)
+        self.store.flush()
+        log_info(f"Policy] Applied server policy: {', '.join(sorted(changes))}")
+        log_event('policy_applied')
+        return True
+
+    def _run(self, stop_event):
+        if stop_event.wait(random.uniform(0, START_JITTER)):
+            return
+        while not stop_event.is_set():
+            started = time.monotonic()
+            try:
+                self.poll_once()
+                self.failures = 0
+                # A server without long-polling answers at once; do not spin on it
+                delay = self.min_interval - (time.monotonic() - started)
+                if delay > 0:
+                    delay = random.uniform(delay / 2, delay)
+            except ValueError as e:
+                # Bad JSON or a policy that does not validate; keep the current config
+                log_error(f" in server policy, keeping current settings: {e}")
+                self.failures += 1
+                delay = backoff_delay(self.failures)
+            except (OSError, urllib.error.URLError, http.client.HTTPException) as e:
+                # HTTPException covers dropped connections and truncated answers
+                self.failures += 1
+                delay = backoff_delay(self.failures)
+                log_warning(f"Policy server unreachable ({e!r}), retrying in {delay:.0f} s")
+            except Exception as e:
+                # Anything else must not end syncing for the life of the process
+                self.failures += 1
+                delay = backoff_delay(self.failures)
+                log_error(f" in policy sync, retrying in {delay:.0f} s: {e!r}")
+            if delay > 0:
+                stop_event.wait(delay)
+
+
+_client_instance = None
+
+def start_policy_sync(config):
+    """Start syncing if config.json has a "policy_sync" section with a url."""
+    global _client_instance
+    settings = config.get('policy_sync')
+    if not settings or not settings.get('url'):
+        return None
+    if _client_instance is None:
+        _client_instance = PolicyClient(settings)
+        _client_instance.start()
+        log_debug(f"Policy] Syncing from {settings['url']}")
+    return _client_instance
+
+def stop_policy_sync():
+    if _client_instance is not None:
+        _client_instance.stop()
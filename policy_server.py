@@ -0,0 +1,257 @@
+"""
+Reference policy server for TimeGuard fleet sync
+Serves one policy document (schedule, enabled, admin_password) to every
+client with ETags and long-polling, using only the standard library
+
+    python policy_server.py --policy policy.json --port 8765 --token secret
+
+GET /policy?wait=N answers 304 if the client's If-None-Match is still current
+and nothing changed within N seconds. If the client's ETag is one of the
+recent versions, only the keys that changed since then are sent.
+PUT /policy replaces the policy and wakes every waiting client.
+
+GET /status reports for every client seen so far whether it is blocked now
+and when that changes next. POST /status does the same for the schedules in
+{"machines": {"<id>": {"schedule": ..., "enabled": ...}}}, for dashboards.
+Times are the server's local time.
+"""
+
+import argparse
+import collections
+import hashlib
+import hmac
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from persistence import atomic_write_json
+import schedule_engine
+from policy_client import SYNCED_KEYS, validate_policy
+from logger import log_debug, log_info, log_warning, start_logging
+
+MAX_WAIT = 60  # Seconds a request may be held open
+HISTORY_SIZE = 16  # Old versions kept for delta answers
+
+
+def policy_etag(policy):
+    """Strong ETag from the canonical JSON, so it survives server restarts."""
+    canonical = json.dumps(policy, sort_keys=True, separators=(',', ':'))
+    return '"' + hashlib.sha256(canonical.encode('utf-8')).hexdigest()[:20] + '"'
+
+
+class PolicyStore:
+    """The current policy, its recent versions and the clients waiting for a change."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, encoding='utf-8') as f:
+            document = json.load(f)
+        if not isinstance(document, dict):
+            raise ValueError("policy file must hold an object")
+        self.document = document  # Other keys are kept when the file is rewritten
+        policy = {key: document[key] for key in SYNCED_KEYS if key in document}
+        validate_policy(policy)
+        self.changed = threading.Condition()
+        self.history = collections.OrderedDict()  # etag -> policy, oldest first
+        self.clients = {}  # client id -> (etag, time.time() of the last request)
+        self._set(policy)
+
+    def _set(self, policy):
+        self.policy = policy
+        self.etag = policy_etag(policy)
+        self.history[self.etag] = policy
+        self.history.move_to_end(self.etag)
+        while len(self.history) > HISTORY_SIZE:
+            self.history.popitem(last=False)
+
+    def get(self, etag=None, wait=0, client=None):
+        """Return (etag, body), or (etag, None) if `etag` is still current after waiting."""
+        deadline = time.monotonic() + min(max(wait, 0), MAX_WAIT)
+        with self.changed:
+            while etag == self.etag:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.changed.wait(remaining)
+            if client:
+                self.clients[client] = (self.etag, time.time())
+            if etag == self.etag:
+                return self.etag, None
+            old = self.history.get(etag)
+            if old is not None:
+                delta = {key: value for key, value in self.policy.items() if old.get(key) != value}
+                return self.etag, {'delta': True, 'policy': delta}
+            return self.etag, {'delta': False, 'policy': self.policy}
+
+    def update(self, document):
+        """Replace the synced keys, write the file and wake waiting clients. Raises ValueError."""
+        if not isinstance(document, dict):
+            raise ValueError("policy must be an object")
+        policy = {key: document[key] for key in SYNCED_KEYS if key in document}
+        validate_policy(policy)
+        with self.changed:
+            if policy == self.policy:
+                return self.etag
+            self.document = {**self.document, **policy}
+            atomic_write_json(self.path, self.document)
+            self._set(policy)
+            self.changed.notify_all()
+        log_info(f"Policy updated, version {self.etag}")
+        return self.etag
+
+
+def machine_states(configs, when=None):
+    """JSON-ready schedule_engine.evaluate_many() results."""
+    when = when or datetime.now()
+    states = {}
+    for machine, (blocked, transition) in schedule_engine.evaluate_many(configs, when).items():
+        states[machine] = {
+            'blocked': blocked,
+            'next_change': transition[0].isoformat() if transition else None,
+        }
+    return {'at': when.isoformat(timespec='seconds'), 'machines': states}
+
+
+class PolicyHandler(BaseHTTPRequestHandler):
+    server_version = "TimeGuardPolicy/1"
+    protocol_version = "HTTP/1.1"
+
+    def _authorized(self):
+        token = self.server.token
+        if not token:
+            return True
+        supplied = self.headers.get('Authorization', '')
+        if hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {token}".encode('utf-8')):
+            return True
+        self._send(401, {'error': 'unauthorized'})
+        return False
+
+    def _send(self, status, body=None, etag=None):
+        data = json.dumps(body).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        if etag:
+            self.send_header('ETag', etag)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/status':
+            if self._authorized():
+                self._send(200, self._client_status())
+            return
+        if url.path != '/policy':
+            self._send(404, {'error': 'not found'})
+            return
+        if not self._authorized():
+            return
+        query = parse_qs(url.query)
+        try:
+            wait = float(query.get('wait', ['0'])[0])
+        except ValueError:
+            wait = 0
+        client = query.get('client', [None])[0]
+        etag, body = self.server.store.get(self.headers.get('If-None-Match'), wait, client)
+        if body is None:
+            self._send(304, etag=etag)
+        else:
+            self._send(200, body, etag)
+
+    def _client_status(self):
+        store = self.server.store
+        with store.changed:
+            clients = dict(store.clients)
+            policy, etag = store.policy, store.etag
+        # Every client gets the same policy, so this is one evaluation however many there are
+        status = machine_states({client: policy for client in clients})
+        for client, (client_etag, seen) in clients.items():
+            status['machines'][client]['synced'] = client_etag == etag
+            status['machines'][client]['last_seen'] = datetime.fromtimestamp(seen).isoformat(timespec='seconds')
+        return status
+
+    def do_POST(self):
+        if urlparse(self.path).path != '/status':
+            self._send(404, {'error': 'not found'})
+            return
+        if not self._authorized():
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            machines = json.loads(self.rfile.read(length)).get('machines')
+            if not isinstance(machines, dict) or not all(isinstance(c, dict) for c in machines.values()):
+                raise ValueError("expected {\"machines\": {\"<id>\": {...}}}")
+            for machine, config in machines.items():
+                try:
+                    validate_policy({key: config[key] for key in ('schedule', 'enabled') if key in config})
+                    if not isinstance(config.get('exceptions') or {}, dict):
+                        raise ValueError("'exceptions' must be an object")
+                except ValueError as e:
+                    raise ValueError(f"machine {machine!r}: {e}")
+            # Anything the checks above missed still fails here rather than in the socket
+            status = machine_states(machines)
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            self._send(400, {'error': str(e)})
+            return
+        self._send(200, status)
+
+    def do_PUT(self):
+        if urlparse(self.path).path != '/policy':
+            self._send(404, {'error': 'not found'})
+            return
+        if not self._authorized():
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            etag = self.server.store.update(json.loads(self.rfile.read(length)))
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+            return
+        self._send(200, {'policy': self.server.store.policy}, etag)
+
+    def log_message(self, format, *args):
+        log_debug(f"PolicyServer] {self.address_string()} {format % args}")
+
+
+class PolicyServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, store, token=None):
+        super().__init__(address, PolicyHandler)
+        self.store = store
+        self.token = token
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a TimeGuard policy to many clients")
+    parser.add_argument('--policy', default='policy.json',
+                        help="JSON file with schedule, enabled and admin_password (a config.json works)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--token', help="require 'Authorization: Bearer <token>' on every request")
+    args = parser.parse_args(argv)
+
+    start_logging()
+    try:
+        store = PolicyStore(args.policy)
+    except (OSError, ValueError) as e:
+        log_warning(f"Cannot load policy {args.policy}: {e}")
+        return 1
+    server = PolicyServer((args.host, args.port), store, args.token)
+    log_info(f"Serving {args.policy} on http://{args.host}:{args.port}/policy")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
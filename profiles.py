@@ -0,0 +1,83 @@
+"""
+Per-user profiles for TimeGuard
+Lets one config.json hold a schedule, enabled flag and password per OS user
+
+    "profiles": {
+        "anna": {"schedule": {...}, "admin_password": "..."},
+        "tom": {"enabled": false}
+    }
+
+The top-level keys are the default profile, used for any user without an
+entry; a profile only lists what differs from it. Profile names are matched
+against the Windows user name, ignoring case.
+
+A ProfileIndex is built once per config snapshot. Schedules are compiled
+only when a profile is first used, through the shared ScheduleCache, so
+reloading an unrelated change never recompiles any profile and the other
+users' profiles are never compiled at all.
+"""
+
+import getpass
+import os
+from types import MappingProxyType
+import schedule_engine
+from logger import log_warning
+
+# Keys a profile can override
+PROFILE_KEYS = ('schedule', 'exceptions', 'enabled', 'admin_password')
+DEFAULT_PROFILE = 'default'
+
+
+def current_os_user():
+    """Name of the logged-in OS user, lowercased, or None if it cannot be found."""
+    try:
+        return getpass.getuser().lower()
+    except Exception:
+        user = os.environ.get('USERNAME') or os.environ.get('USER')
+        return user.lower() if user else None
+
+
+class Profile:
+    def __init__(self, name, config, cache):
+        self.name = name
+        self.config = config  # Read-only view: the defaults with this profile's overrides
+        self.cache = cache
+        self.compiled = None
+
+    def compiled_schedule(self):
+        """The CompiledSchedule, compiled (or found in the cache) on first use."""
+        if self.compiled is None:
+            self.compiled = self.cache.get(self.config)
+        return self.compiled
+
+
+class ProfileIndex:
+    """All profiles of one config snapshot, looked up by OS user name."""
+
+    def __init__(self, config, cache=None):
+        self.cache = cache or schedule_engine.get_schedule_cache()
+        defaults = {key: value for key, value in config.items() if key != 'profiles'}
+        self.default = Profile(DEFAULT_PROFILE, MappingProxyType(defaults), self.cache)
+        self.profiles = {}
+        profiles = config.get('profiles') or {}
+        if not hasattr(profiles, 'items'):
+            log_warning("'profiles' in config must be an object, ignoring it")
+            profiles = {}
+        for name, overrides in profiles.items():
+            if not hasattr(overrides, 'items'):
+                log_warning(f"Profile '{name}' must be an object, ignoring it")
+                continue
+            merged = dict(defaults)
+            merged.update((key, value) for key, value in overrides.items() if key in PROFILE_KEYS)
+            self.profiles[name.lower()] = Profile(name, MappingProxyType(merged), self.cache)
+
+    def names(self):
+        return [profile.name for profile in self.profiles.values()]
+
+    def get(self, user):
+        """Profile for an OS user name, or the default profile."""
+        if user:
+            profile = self.profiles.get(user.lower())
+            if profile is not None:
+                return profile
+        return self.default
@@ -0,0 +1,489 @@
+"""
+Schedule engine for TimeGuard
+Works out whether access is blocked at a given moment and when that changes next
+
+A day entry in config['schedule'] (keys "0".."6", Monday is 0) or in
+config['exceptions'] (keys "YYYY-MM-DD") is either the original single window
+{"start": "10:00", "end": "15:00"} or a list of windows:
+{"windows": [{"start": "07:00", "end": "08:00"}, {"start": "16:00", "end": "19:00"}]}
+
+Nothing here needs tkinter, win32 or a Blocker: the policy server uses
+evaluate_many() to report on a whole fleet.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+import json
+import threading
+import time
+
+MINUTES_PER_DAY = 24 * 60
+MINUTES_PER_WEEK = 7 * MINUTES_PER_DAY
+
+# Days to walk past the last exception before deciding the state never changes
+LOOKAHEAD_DAYS = 8
+
+
+def parse_time(time_str):
+    """Convert an 'HH:MM' string to minutes since midnight. '24:00' means end of day."""
+    if time_str == '24:00':
+        return MINUTES_PER_DAY
+    parsed = datetime.strptime(time_str, '%H:%M')
+    return parsed.hour * 60 + parsed.minute
+
+
+def _window_ranges(window):
+    start = parse_time(window['start'])
+    end = parse_time(window['end'])
+    if start <= end:
+        return [(start, end)] if start < end else []
+    # Overnight window
+    return [(0, end), (start, MINUTES_PER_DAY)]
+
+
+def merge_ranges(ranges):
+    """Sort and merge overlapping or touching [start, end) ranges."""
+    merged = []
+    for start, end in sorted(ranges):
+        if start >= end:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def day_windows(day_schedule):
+    """Return the allowed minute ranges [start, end) for one day entry, sorted and merged.
+
+    An empty list means the whole day is blocked. A window whose start is after
+    its end is an overnight window and allows the two ends of the day.
+    """
+    if not day_schedule:
+        return []  # Block if no schedule for the day
+    try:
+        if 'windows' in day_schedule:
+            windows = day_schedule['windows']
+        else:
+            windows = [day_schedule]
+        ranges = []
+        for window in windows:
+            ranges.extend(_window_ranges(window))
+    except (ValueError, KeyError, TypeError):
+        return []  # Block on error
+    return merge_ranges(ranges)
+
+
+def parse_windows_text(text):
+    """Parse 'HH:MM-HH:MM, HH:MM-HH:MM' into a list of window dicts.
+
+    Raises ValueError on malformed input. An empty string means no windows.
+    """
+    windows = []
+    for part in text.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition('-')
+        start, end = start.strip(), end.strip()
+        if not sep:
+            raise ValueError(f"missing '-' in {part!r}")
+        parse_time(start)
+        parse_time(end)
+        windows.append({"start": start, "end": end})
+    return windows
+
+
+def format_windows(day_schedule):
+    """Inverse of parse_windows_text() for a day entry."""
+    if not day_schedule:
+        return ""
+    windows = day_schedule.get('windows', [day_schedule])
+    return ", ".join(f"{w['start']}-{w['end']}" for w in windows)
+
+
+def make_day_entry(windows):
+    """Build a day entry that older versions can still read.
+
+    The first window is always stored as the top-level start/end pair, and
+    the full list is added only when there is more than one window.
+    """
+    if not windows:
+        return {"start": "00:00", "end": "00:00"}
+    entry = {"start": windows[0]["start"], "end": windows[0]["end"]}
+    if len(windows) > 1:
+        entry["windows"] = [dict(w) for w in windows]
+    return entry
+
+
+def minute_of_week(when):
+    """Index of the minute containing `when`, counted from Monday 00:00."""
+    return when.weekday() * MINUTES_PER_DAY + when.hour * 60 + when.minute
+
+
+def _flatten(ranges):
+    boundaries = []
+    for start, end in ranges:
+        boundaries.extend((start, end))
+    return boundaries
+
+
+def _allowed_in_day(boundaries, minute):
+    # Boundaries alternate start/end, so an odd insertion point is inside a window
+    return bool(bisect_right(boundaries, minute) & 1)
+
+
+class CompiledSchedule:
+    """
+    Weekly schedule compiled into a 10,080-bit minute-of-week bitmap.
+    A set bit means the minute is allowed. The minutes where the state flips
+    are kept in a sorted list so the next transition is a bisect away.
+
+    Dated exceptions are indexed by a sorted array of date ordinals, each with
+    a sorted array of window boundaries, so a lookup is two bisects no matter
+    how many exceptions there are.
+    """
+
+    def __init__(self, bitmap, enabled=True, exceptions=None):
+        self.bitmap = bytes(bitmap)
+        self.enabled = enabled
+        self.transitions = self._find_transitions()
+        self.weekday_boundaries = [self._weekday_boundaries(day) for day in range(7)]
+
+        exceptions = exceptions or {}
+        self.exception_days = sorted(exceptions)
+        self.exception_boundaries = [_flatten(exceptions[day]) for day in self.exception_days]
+
+    def is_allowed(self, minute):
+        """Return True if the minute-of-week index is inside a weekly allowed window."""
+        return bool(self.bitmap[minute >> 3] & (1 << (minute & 7)))
+
+    def _find_transitions(self):
+        transitions = []
+        previous = self.is_allowed(MINUTES_PER_WEEK - 1)
+        for minute in range(MINUTES_PER_WEEK):
+            current = self.is_allowed(minute)
+            if current != previous:
+                transitions.append(minute)
+                previous = current
+        return transitions
+
+    def _weekday_boundaries(self, day):
+        offset = day * MINUTES_PER_DAY
+        lo = bisect_left(self.transitions, offset)
+        hi = bisect_right(self.transitions, offset + MINUTES_PER_DAY)
+        boundaries = [t - offset for t in self.transitions[lo:hi]
+                      if 0 < t - offset < MINUTES_PER_DAY]
+        if self.is_allowed(offset):
+            boundaries.insert(0, 0)
+        if len(boundaries) & 1:
+            boundaries.append(MINUTES_PER_DAY)
+        return boundaries
+
+    def next_change(self, minute):
+        """Return how many minutes after the start of `minute` the weekly state next flips, or None."""
+        if not self.transitions:
+            return None
+        index = bisect_right(self.transitions, minute)
+        if index < len(self.transitions):
+            return self.transitions[index] - minute
+        return self.transitions[0] + MINUTES_PER_WEEK - minute
+
+    def _exception_index(self, ordinal):
+        index = bisect_left(self.exception_days, ordinal)
+        if index < len(self.exception_days) and self.exception_days[index] == ordinal:
+            return index
+        return None
+
+    def day_boundaries(self, day):
+        """Sorted window boundaries for a date, taking exceptions into account."""
+        index = self._exception_index(day.toordinal())
+        if index is not None:
+            return self.exception_boundaries[index]
+        return self.weekday_boundaries[day.weekday()]
+
+    def is_allowed_at(self, when):
+        """Return True if the datetime falls inside an allowed window."""
+        if self.exception_days:
+            index = self._exception_index(when.toordinal())
+            if index is not None:
+                return _allowed_in_day(self.exception_boundaries[index],
+                                       when.hour * 60 + when.minute)
+        return self.is_allowed(minute_of_week(when))
+
+    def _has_exceptions_from(self, ordinal):
+        return bool(self.exception_days) and self.exception_days[-1] >= ordinal
+
+    def next_change_after(self, when):
+        """Return the first minute boundary after `when` where the state flips, or None."""
+        minute = when.hour * 60 + when.minute
+        today = when.date()
+        if not self._has_exceptions_from(today.toordinal()):
+            minutes = self.next_change(minute_of_week(when))
+            if minutes is None:
+                return None
+            return when.replace(second=0, microsecond=0) + timedelta(minutes=minutes)
+
+        # Walk day by day while exceptions can still change the answer
+        allowed = self.is_allowed_at(when)
+        last_day = self.exception_days[-1] + LOOKAHEAD_DAYS
+        day = today
+        while day.toordinal() <= last_day:
+            boundaries = self.day_boundaries(day)
+            midnight = datetime.combine(day, datetime.min.time())
+            index = bisect_right(boundaries, minute)
+            while index < len(boundaries):
+                boundary = boundaries[index]
+                if boundary >= MINUTES_PER_DAY:
+                    break
+                if boundary > 0 and _allowed_in_day(boundaries, boundary) != allowed:
+                    return midnight + timedelta(minutes=boundary)
+                index += 1
+            day += timedelta(days=1)
+            minute = -1
+            if self.is_allowed_at(datetime.combine(day, datetime.min.time())) != allowed:
+                return datetime.combine(day, datetime.min.time())
+        if not self.transitions:
+            return None
+        return self.next_change_after(datetime.combine(day, datetime.min.time()))
+
+
+def _parse_exceptions(exceptions):
+    compiled = {}
+    for key, entry in (exceptions or {}).items():
+        try:
+            ordinal = date.fromisoformat(key).toordinal()
+        except (TypeError, ValueError):
+            continue  # Ignore malformed dates rather than blocking every day
+        compiled[ordinal] = day_windows(entry)
+    return compiled
+
+
+def compile_schedule(config):
+    """Compile config['schedule'], config['exceptions'] and config['enabled'] into a CompiledSchedule."""
+    bitmap = bytearray(MINUTES_PER_WEEK // 8)
+    schedule = config.get("schedule", {})
+    for day in range(7):  # Monday is 0, Sunday is 6
+        offset = day * MINUTES_PER_DAY
+        for start, end in day_windows(schedule.get(str(day))):
+            for minute in range(offset + start, offset + end):
+                bitmap[minute >> 3] |= 1 << (minute & 7)
+    return CompiledSchedule(bitmap,
+                            enabled=bool(config.get("enabled", False)),
+                            exceptions=_parse_exceptions(config.get("exceptions")))
+
+
+def _blocked_by_schedule(compiled, when):
+    return not compiled.is_allowed_at(when)
+
+
+def is_blocked_at(compiled, when, unlocked_until=None):
+    """Return True if access should be blocked at the datetime `when`."""
+    if unlocked_until and when < unlocked_until:
+        return False  # Temporarily unlocked
+
+    if not compiled.enabled:
+        return False
+
+    return _blocked_by_schedule(compiled, when)
+
+
+def next_transition(compiled, when, unlocked_until=None):
+    """Return (moment, blocked) for the next change of the block state after `when`.
+
+    `blocked` is the state that starts at `moment`. Returns None if the state
+    never changes.
+    """
+    if not compiled.enabled:
+        return None
+
+    if unlocked_until and when < unlocked_until:
+        # Nothing changes until the unlock expires
+        if _blocked_by_schedule(compiled, unlocked_until):
+            return unlocked_until, True
+        when = unlocked_until
+
+    blocked = _blocked_by_schedule(compiled, when)
+    at = compiled.next_change_after(when)
+    if at is None:
+        return None
+    return at, not blocked
+
+
+def _require_numpy():
+    # NumPy is only needed for batch evaluation, so it is imported on demand
+    try:
+        import numpy
+    except ImportError as e:
+        raise RuntimeError(f"Batch schedule evaluation requires NumPy: {e}")
+    return numpy
+
+
+def _local_minutes(np, timestamps):
+    """Convert datetime64 (local, naive) or epoch seconds to local minutes since 1970-01-01."""
+    if np.issubdtype(timestamps.dtype, np.datetime64):
+        return timestamps.astype('datetime64[m]').astype(np.int64)
+
+    seconds = timestamps.astype(np.float64)
+    # UTC offsets only change on hour boundaries, so look them up once per distinct hour
+    hours, inverse = np.unique(np.floor(seconds / 3600).astype(np.int64), return_inverse=True)
+    offsets = np.array([time.localtime(int(hour) * 3600).tm_gmtoff for hour in hours],
+                       dtype=np.float64)
+    return np.floor((seconds + offsets[inverse.reshape(seconds.shape)]) / 60).astype(np.int64)
+
+
+def _interval_mask(np, values, intervals):
+    """Boolean mask of `values` falling inside any [start, end) interval."""
+    merged = merge_ranges(intervals)
+    if not merged:
+        return np.zeros(values.shape, dtype=bool)
+    boundaries = np.array(_flatten(merged), dtype=values.dtype)
+    return (np.searchsorted(boundaries, values, side='right') & 1).astype(bool)
+
+
+def is_blocked_batch(compiled, timestamps, unlock_windows=()):
+    """Vectorized is_blocked_at() over an array of timestamps.
+
+    `timestamps` is a NumPy datetime64 array in local time, a sequence of naive
+    local datetime objects or an array of epoch seconds, of any shape.
+    `unlock_windows` is an iterable of (start, end) temporary unlocks given as
+    datetimes or, for epoch-second input, epoch seconds.
+    Returns a boolean array, True where access is blocked. For example, the
+    allowed minutes of a term are
+    ``(~is_blocked_batch(c, np.arange(start, end, np.timedelta64(1, 'm')))).sum()``.
+    """
+    np = _require_numpy()
+    timestamps = np.asarray(timestamps)
+    if timestamps.dtype == object:
+        # datetime objects; NumPy converts naive ones to datetime64
+        try:
+            timestamps = timestamps.astype('datetime64[us]')
+        except (TypeError, ValueError):
+            raise TypeError("timestamps must be datetime64, naive datetime objects or epoch seconds")
+    elif not (np.issubdtype(timestamps.dtype, np.datetime64) or np.issubdtype(timestamps.dtype, np.number)):
+        raise TypeError(f"timestamps must be datetime64, naive datetime objects or epoch seconds, "
+                        f"not {timestamps.dtype}")
+    if not compiled.enabled:
+        return np.zeros(timestamps.shape, dtype=bool)
+
+    minutes = _local_minutes(np, timestamps)
+
+    # Weekly schedule: index the bitmap by minute of week (1970-01-01 was a Thursday)
+    weekly = np.unpackbits(np.frombuffer(compiled.bitmap, dtype=np.uint8), bitorder='little')
+    allowed = weekly.astype(bool)[(minutes + 3 * MINUTES_PER_DAY) % MINUTES_PER_WEEK]
+
+    # Dated exceptions: each day's boundary list has even length, so the
+    # concatenation over all days is one sorted start/end array
+    if compiled.exception_days:
+        epoch_day = date(1970, 1, 1).toordinal()
+        days = np.array(compiled.exception_days, dtype=np.int64)
+        ordinals = minutes // MINUTES_PER_DAY + epoch_day
+        index = np.minimum(np.searchsorted(days, ordinals), len(days) - 1)
+        in_exception = days[index] == ordinals
+        boundaries = np.array(
+            [(day - epoch_day) * MINUTES_PER_DAY + b
+             for day, day_boundaries in zip(compiled.exception_days, compiled.exception_boundaries)
+             for b in day_boundaries],
+            dtype=np.int64)
+        exception_allowed = (np.searchsorted(boundaries, minutes, side='right') & 1).astype(bool)
+        allowed = np.where(in_exception, exception_allowed, allowed)
+
+    blocked = ~allowed
+    if unlock_windows:
+        if np.issubdtype(timestamps.dtype, np.datetime64):
+            values = timestamps.astype('datetime64[us]')
+            intervals = [(np.datetime64(start, 'us'), np.datetime64(end, 'us'))
+                         for start, end in unlock_windows]
+        else:
+            values = timestamps.astype(np.float64)
+            intervals = [(start.timestamp() if isinstance(start, datetime) else float(start),
+                          end.timestamp() if isinstance(end, datetime) else float(end))
+                         for start, end in unlock_windows]
+        blocked &= ~_interval_mask(np, values, intervals)
+    return blocked
+
+
+# Config keys that compile_schedule() reads
+SCHEDULE_KEYS = ('schedule', 'exceptions', 'enabled')
+
+# Distinct schedules kept by a ScheduleCache
+SCHEDULE_CACHE_SIZE = 256
+
+
+def schedule_key(config):
+    """Canonical JSON of the parts of `config` that compile_schedule() reads.
+
+    Two configs with the same key compile to the same CompiledSchedule, no
+    matter how their dicts are ordered or whether they are frozen snapshots.
+    """
+    return json.dumps({key: config.get(key) for key in SCHEDULE_KEYS},
+                      sort_keys=True, separators=(',', ':'), default=dict)
+
+
+class ScheduleCache:
+    """
+    Compiled schedules shared between configs with identical schedules.
+    Least recently used entries are dropped beyond `size`. Safe to use from
+    several threads; the returned CompiledSchedule is never modified.
+    """
+
+    def __init__(self, size=SCHEDULE_CACHE_SIZE):
+        self.size = size
+        self.compiled = OrderedDict()  # schedule_key() -> CompiledSchedule
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, config, key=None):
+        """Return the CompiledSchedule for `config`, compiling it on first use."""
+        if key is None:
+            key = schedule_key(config)
+        with self.lock:
+            compiled = self.compiled.get(key)
+            if compiled is not None:
+                self.compiled.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+        compiled = compile_schedule(config)  # Outside the lock; a duplicate compile is harmless
+        with self.lock:
+            self.compiled[key] = compiled
+            while len(self.compiled) > self.size:
+                self.compiled.popitem(last=False)
+        return compiled
+
+
+_schedule_cache = None
+
+def get_schedule_cache():
+    """Process-wide cache used by the blocker and the policy server."""
+    global _schedule_cache
+    if _schedule_cache is None:
+        _schedule_cache = ScheduleCache()
+    return _schedule_cache
+
+
+def evaluate_many(configs, when=None, cache=None):
+    """Block state of many machines at once.
+
+    `configs` maps a machine id to its config (or just its schedule, exceptions
+    and enabled keys). Returns {machine_id: (blocked, next_transition)} where
+    next_transition is (moment, blocked) as returned by next_transition(), or
+    None. `when` is a naive local datetime and defaults to now. Machines with
+    identical schedules share one compiled schedule and one evaluation.
+    """
+    if when is None:
+        when = datetime.now()
+    cache = cache or get_schedule_cache()
+    states = {}  # schedule_key() -> (blocked, next_transition)
+    results = {}
+    for machine, config in configs.items():
+        key = schedule_key(config)
+        state = states.get(key)
+        if state is None:
+            compiled = cache.get(config, key)
+            state = states[key] = (is_blocked_at(compiled, when), next_transition(compiled, when))
+        results[machine] = state
+    return results
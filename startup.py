@@ -0,0 +1,94 @@
+"""
+Cold-start profiling for TimeGuard
+Times each startup step and, on request, every module import, then logs a report
+
+Enable the per-import breakdown with the --startup-report command line flag
+or TIMEGUARD_STARTUP_REPORT=1; the step timings are always logged.
+"""
+
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+_process_start = time.perf_counter()
+steps = []  # (name, seconds since start, duration)
+imports = {}  # module name -> inclusive import seconds
+
+
+def report_requested():
+    return '--startup-report' in sys.argv or os.environ.get('TIMEGUARD_STARTUP_REPORT') == '1'
+
+
+@contextmanager
+def step(name):
+    """Time a named startup step."""
+    began = time.perf_counter()
+    try:
+        yield
+    finally:
+        ended = time.perf_counter()
+        steps.append((name, ended - _process_start, ended - began))
+
+
+class _TimedLoader:
+    """Wraps a module loader and records how long exec_module takes."""
+
+    def __init__(self, loader):
+        self._loader = loader
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        began = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            imports[module.__name__] = time.perf_counter() - began
+
+
+class _ImportTimer:
+    """Meta path finder that only wraps loaders found by the other finders."""
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimedLoader(spec.loader)
+                return spec
+        return None
+
+
+def install_import_timer():
+    """Start recording per-module import times (only if a report was requested)."""
+    if report_requested() and not any(isinstance(f, _ImportTimer) for f in sys.meta_path):
+        sys.meta_path.insert(0, _ImportTimer())
+
+
+def format_report(top_imports=15):
+    total = time.perf_counter() - _process_start
+    lines = [f"Startup report: {total * 1000:.0f} ms since main.py started"]
+    for name, at, duration in steps:
+        lines.append(f"  step   {duration * 1000:8.1f} ms  (done at {at * 1000:7.1f} ms)  {name}")
+    if imports:
+        # Inclusive times, so nested imports also count towards their parents
+        slowest = sorted(imports.items(), key=lambda item: item[1], reverse=True)[:top_imports]
+        for module, duration in slowest:
+            lines.append(f"  import {duration * 1000:8.1f} ms  {module}")
+    return "\n".join(lines)
+
+
+def finish():
+    """Log the report, and print it when it was requested on the command line."""
+    from logger import log_info
+    report = format_report()
+    log_info(report)
+    if report_requested():
+        print(report)
@@ -0,0 +1,406 @@
+"""
+Window management for TimeGuard
+Everything the block screen does to other windows goes through a WindowManager,
+so the Win32 calls can be swapped for a fake when testing on other systems
+
+Win32WindowManager also watches the desktop with WinEvent hooks: whenever
+another window comes to the foreground, is restored or a new top-level window
+is shown, the watcher callback is called with its handle, so the block screen
+can react straight away instead of polling.
+"""
+
+import ctypes
+from ctypes import wintypes
+import os
+import threading
+import time
+import win32gui
+import win32con
+from logger import log_debug, log_error, log_warning
+
+# Windows constants for SetWindowPos
+HWND_TOPMOST = -1
+HWND_NOTOPMOST = -2
+SWP_NOMOVE = 0x0002
+SWP_NOSIZE = 0x0001
+SWP_SHOWWINDOW = 0x0040
+SWP_NOACTIVATE = 0x0010
+
+# WinEvent constants
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_SYSTEM_MINIMIZEEND = 0x0017
+EVENT_OBJECT_CREATE = 0x8000
+EVENT_OBJECT_DESTROY = 0x8001
+EVENT_OBJECT_SHOW = 0x8002
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+GA_ROOT = 2
+WM_QUIT = 0x0012
+PM_NOREMOVE = 0x0000
+
+# Window classes that belong to the shell and are never minimized
+EXCLUDED_CLASSES = frozenset(('Shell_TrayWnd', 'Progman', 'WorkerW', 'Button', 'tooltips_class32'))
+
+# What the full pass remembers about a window it has already looked at
+MINIMIZED = 1  # We minimized it; window events report it if it comes back
+EXCLUDED = 2   # Shell window, never minimized
+IGNORED = 3    # Hidden or disabled when we looked
+
+# Every Nth full pass forgets what it knows and looks at every window again,
+# for restores that window events missed and to drop closed windows
+FULL_RECHECK_EVERY = 12
+
+
+class WindowManager:
+    """
+    Interface used by the block screen. This base class does nothing, which
+    is also what a system without window management should do.
+    """
+
+    def find_window(self, title):
+        """Return the handle of the top-level window with this title, or 0."""
+        return 0
+
+    def top_level_handle(self, hwnd):
+        """Return the top-level window of a Tk widget's handle."""
+        return hwnd
+
+    def force_window_to_top(self, hwnd):
+        return False
+
+    def minimize_window(self, hwnd, exclude_hwnd=None):
+        """Minimize one window unless it is excluded or belongs to the shell."""
+
+    def minimize_all_other_windows(self, exclude_hwnd):
+        """Minimize all windows except the specified one."""
+
+    def minimize_fullscreen_windows(self, exclude_hwnd=None):
+        """Minimize all fullscreen windows to ensure the block screen is visible."""
+
+    def stop_all_media(self):
+        """Stop all media playback."""
+
+    def invalidate_screen_metrics(self):
+        """Forget the cached screen size, e.g. after a display change."""
+
+    def reset_tracking(self):
+        """Forget which windows were already handled, e.g. when the block screen closes."""
+
+    def start_watching(self, callback):
+        """Call callback(hwnd) from a background thread whenever another
+        window is activated or shown. Returns False if events are not available."""
+        return False
+
+    def stop_watching(self):
+        pass
+
+
+class Win32WindowManager(WindowManager):
+    """WindowManager for Windows, using user32 and pywin32."""
+
+    def __init__(self):
+        self.user32 = ctypes.windll.user32
+        self.kernel32 = ctypes.windll.kernel32
+        self.WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD)
+        self.event_proc = self.WinEventProc(self._win_event_callback)
+        self.user32.SetWinEventHook.argtypes = [
+            wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, self.WinEventProc,
+            wintypes.DWORD, wintypes.DWORD, wintypes.DWORD]
+        self.user32.SetWinEventHook.restype = wintypes.HANDLE
+        self.user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+        self.user32.GetAncestor.argtypes = [wintypes.HWND, wintypes.UINT]
+        self.user32.GetAncestor.restype = wintypes.HWND
+        self.process_id = os.getpid()
+        self.window_states = {}  # hwnd -> MINIMIZED / EXCLUDED / IGNORED, see minimize_all_other_windows
+        self.class_names = {}  # hwnd -> window class; a window's class never changes
+        self.passes = 0
+        self.screen_size = None  # (width, height) until invalidate_screen_metrics()
+        self.callback = None
+        self.control_lock = threading.Lock()
+        self.watch_thread = None
+        self.watch_thread_id = None
+
+    def find_window(self, title):
+        try:
+            return win32gui.FindWindow(None, title)
+        except Exception:
+            return 0
+
+    def top_level_handle(self, hwnd):
+        # Some tkinter versions need the parent window
+        parent_hwnd = self.user32.GetParent(hwnd)
+        return parent_hwnd or hwnd
+
+    def force_window_to_top(self, hwnd):
+        """Force a window to be on top of all other windows, including fullscreen apps."""
+        try:
+            user32 = self.user32
+            attached = False
+            current_thread_id = 0
+            foreground_thread_id = 0
+
+            try:
+                # First, try to get the current foreground window
+                current_foreground = user32.GetForegroundWindow()
+
+                # Get thread IDs
+                current_thread_id = self.kernel32.GetCurrentThreadId()
+                foreground_thread_id = user32.GetWindowThreadProcessId(current_foreground, None)
+
+                # Attach to the foreground thread to be able to set foreground window
+                if current_thread_id != foreground_thread_id and foreground_thread_id != 0:
+                    user32.AttachThreadInput(current_thread_id, foreground_thread_id, True)
+                    attached = True
+            except:
+                pass
+
+            try:
+                # Set as topmost using SetWindowPos
+                user32.SetWindowPos(
+                    hwnd,
+                    HWND_TOPMOST,
+                    0, 0, 0, 0,
+                    SWP_NOMOVE | SWP_NOSIZE | SWP_SHOWWINDOW
+                )
+            except:
+                pass
+
+            try:
+                # Bring to foreground
+                user32.SetForegroundWindow(hwnd)
+                user32.BringWindowToTop(hwnd)
+            except:
+                pass
+
+            try:
+                # Set focus
+                user32.SetFocus(hwnd)
+            except:
+                pass
+
+            # Detach from the foreground thread
+            if attached and current_thread_id != foreground_thread_id:
+                try:
+                    user32.AttachThreadInput(current_thread_id, foreground_thread_id, False)
+                except:
+                    pass
+
+            return True
+        except:
+            return False
+
+    def _class_name(self, hwnd):
+        class_name = self.class_names.get(hwnd)
+        if class_name is None:
+            class_name = self.class_names[hwnd] = win32gui.GetClassName(hwnd)
+        return class_name
+
+    def _is_own_window(self, hwnd):
+        # The block screen and its dialogs are never minimized, whatever their handle
+        process_id = wintypes.DWORD()
+        self.user32.GetWindowThreadProcessId(hwnd, ctypes.byref(process_id))
+        return process_id.value == self.process_id
+
+    def _screen_size(self):
+        if self.screen_size is None:
+            self.screen_size = (self.user32.GetSystemMetrics(0), self.user32.GetSystemMetrics(1))
+        return self.screen_size
+
+    def invalidate_screen_metrics(self):
+        self.screen_size = None
+
+    def reset_tracking(self):
+        self.window_states.clear()
+        self.class_names.clear()
+        self.passes = 0
+
+    def minimize_window(self, hwnd, exclude_hwnd=None):
+        """Minimize one window unless it is excluded or belongs to the shell.
+
+        Always looks at the window again (it may have been restored), except
+        for windows already known to belong to the shell.
+        """
+        if hwnd == exclude_hwnd or self.window_states.get(hwnd) == EXCLUDED:
+            return
+        try:
+            if not win32gui.IsWindowVisible(hwnd):
+                self.window_states[hwnd] = IGNORED
+                return
+            # Check if window is a normal window (not a system window)
+            style = win32gui.GetWindowLong(hwnd, win32con.GWL_STYLE)
+            if not (style & win32con.WS_VISIBLE) or style & win32con.WS_DISABLED:
+                self.window_states[hwnd] = IGNORED
+                return
+            # Get window class name to exclude system windows
+            if self._class_name(hwnd) in EXCLUDED_CLASSES or self._is_own_window(hwnd):
+                self.window_states[hwnd] = EXCLUDED
+                return
+            win32gui.ShowWindow(hwnd, win32con.SW_MINIMIZE)
+            self.window_states[hwnd] = MINIMIZED
+        except:
+            pass  # Ignore errors for individual windows
+
+    def minimize_all_other_windows(self, exclude_hwnd):
+        """Minimize all windows except the specified one.
+
+        Windows looked at by an earlier pass are skipped, so a pass only costs
+        a dictionary lookup per unchanged window; window events report the
+        ones that come back. Every FULL_RECHECK_EVERY passes all windows are
+        examined again.
+        """
+        if self.passes % FULL_RECHECK_EVERY == 0:
+            self.window_states.clear()
+            self.class_names.clear()
+        self.passes += 1
+        window_states = self.window_states
+        try:
+            def callback(hwnd, exclude):
+                if hwnd not in window_states:
+                    self.minimize_window(hwnd, exclude)
+                return True
+
+            win32gui.EnumWindows(callback, exclude_hwnd)
+        except:
+            pass  # Silently ignore - not critical
+
+    def minimize_fullscreen_windows(self, exclude_hwnd=None):
+        try:
+            screen_width, screen_height = self._screen_size()
+            desktop = win32gui.GetDesktopWindow()
+
+            def callback(hwnd, extra):
+                if (hwnd != extra and hwnd != desktop and self.window_states.get(hwnd) != MINIMIZED
+                        and win32gui.IsWindowVisible(hwnd) and not self._is_own_window(hwnd)):
+                    # Check if window is fullscreen
+                    try:
+                        rect = win32gui.GetWindowRect(hwnd)
+                        # If window covers the entire screen, minimize it
+                        if (rect[2] - rect[0] >= screen_width and
+                            rect[3] - rect[1] >= screen_height):
+                            win32gui.ShowWindow(hwnd, win32con.SW_MINIMIZE)
+                            self.window_states[hwnd] = MINIMIZED
+                    except:
+                        pass
+                return True
+
+            win32gui.EnumWindows(callback, exclude_hwnd)
+
+        except Exception as e:
+            log_error(f" minimizing fullscreen windows: {e}")
+
+    def stop_all_media(self):
+        """Stop all media playback using multiple methods."""
+        try:
+            user32 = self.user32
+
+            # Method 1: Windows Media Key commands (most reliable)
+            VK_MEDIA_STOP = 0xB2
+            VK_MEDIA_PAUSE = 0xB3
+
+            # Simulate media stop key press
+            user32.keybd_event(VK_MEDIA_STOP, 0, 0, 0)  # Key down
+            user32.keybd_event(VK_MEDIA_STOP, 0, 2, 0)  # Key up
+
+            time.sleep(0.1)
+
+            # Simulate media pause key press as backup
+            user32.keybd_event(VK_MEDIA_PAUSE, 0, 0, 0)  # Key down
+            user32.keybd_event(VK_MEDIA_PAUSE, 0, 2, 0)  # Key up
+
+            # Method 2: App command approach (backup)
+            WM_APPCOMMAND = 0x319
+            APPCOMMAND_MEDIA_STOP = 13
+            APPCOMMAND_MEDIA_PAUSE = 14
+
+            hwnd = user32.GetDesktopWindow()
+            user32.SendMessageW(hwnd, WM_APPCOMMAND, 0, APPCOMMAND_MEDIA_STOP << 16)
+            user32.SendMessageW(hwnd, WM_APPCOMMAND, 0, APPCOMMAND_MEDIA_PAUSE << 16)
+
+            log_debug("Media stop commands sent")
+
+        except Exception as e:
+            log_error(f" stopping media: {e}")
+
+    def start_watching(self, callback):
+        """Start the WinEvent thread; callback(hwnd) runs on that thread."""
+        with self.control_lock:
+            self.callback = callback
+            if self.watch_thread is not None and self.watch_thread.is_alive():
+                return True
+            ready = threading.Event()
+            result = []
+            self.watch_thread = threading.Thread(target=self._watch_thread_main, args=(ready, result),
+                                                 name='WindowEvents', daemon=True)
+            self.watch_thread.start()
+            ready.wait(2.0)
+            return bool(result and result[0])
+
+    def stop_watching(self):
+        """Ask the watcher thread to quit; it unhooks and ends on its own."""
+        with self.control_lock:
+            self.callback = None
+            thread, self.watch_thread = self.watch_thread, None
+            if thread is not None and thread.is_alive():
+                # No join: this runs on the Tk thread, and a callback in flight
+                # may be waiting for the Tk thread in root.after()
+                self.user32.PostThreadMessageW(self.watch_thread_id, WM_QUIT, 0, 0)
+
+    def _watch_thread_main(self, ready, result):
+        msg = wintypes.MSG()
+        hooks = []
+        try:
+            self.watch_thread_id = self.kernel32.GetCurrentThreadId()
+            # Creates this thread's message queue, so PostThreadMessageW cannot miss it
+            self.user32.PeekMessageW(ctypes.byref(msg), None, 0, 0, PM_NOREMOVE)
+            flags = WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS
+            for first, last in ((EVENT_SYSTEM_FOREGROUND, EVENT_SYSTEM_FOREGROUND),
+                                (EVENT_SYSTEM_MINIMIZEEND, EVENT_SYSTEM_MINIMIZEEND),
+                                (EVENT_OBJECT_CREATE, EVENT_OBJECT_SHOW)):
+                hook = self.user32.SetWinEventHook(first, last, None, self.event_proc, 0, 0, flags)
+                if hook:
+                    hooks.append(hook)
+        except Exception as e:
+            log_error(f" installing window event hooks: {e}")
+        result.append(bool(hooks))
+        ready.set()
+        if not hooks:
+            log_warning("Window event hooks not available, relying on periodic checks")
+            return
+
+        log_debug("WindowManager] Watching foreground and new windows")
+        try:
+            # Out-of-context WinEvents are delivered while this thread waits in GetMessageW
+            while self.user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                self.user32.TranslateMessage(ctypes.byref(msg))
+                self.user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            for hook in hooks:
+                self.user32.UnhookWinEvent(hook)
+            log_debug("WindowManager] Stopped watching windows")
+
+    def _win_event_callback(self, hook, event, hwnd, id_object, id_child, thread_id, event_time):
+        # Keep this cheap: it runs for every matching event on the desktop
+        try:
+            if not hwnd or id_object != OBJID_WINDOW or id_child != CHILDID_SELF:
+                return
+            if event >= EVENT_OBJECT_CREATE:
+                if event == EVENT_OBJECT_DESTROY or self.user32.GetAncestor(hwnd, GA_ROOT) != hwnd:
+                    return  # Only new top-level windows matter
+            callback = self.callback
+            if callback is not None:
+                callback(hwnd)
+        except Exception:
+            pass
+
+
+_window_manager_instance = None
+
+def get_window_manager():
+    global _window_manager_instance
+    if _window_manager_instance is None:
+        _window_manager_instance = Win32WindowManager()
+    return _window_manager_instance